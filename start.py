@@ -1,26 +1,41 @@
 import asyncio
 import functools
+import time
 import ipywidgets as ipw
 from datetime import datetime
-from utils.control import * 
-from utils.aiida_and_ssh_utils import key_is_valid,get_old_unfinished_workchains
+from utils.control import (
+    check_repository, get_config, load_config_file, check_for_updates, computer_details,
+    setup_computers, setup_codes, manage_uenv_images, config_path,
+)
+from utils.string_utils import remove_green_check_lines
+from utils.ssh_utils import key_is_valid, update_ssh_config, set_ssh, execute_custom_commands, close_ssh_sessions
+from utils.process_utils import get_old_unfinished_workchains,get_process_status_snapshot,get_old_workchain_candidates,play_paused_workchains
+from utils.widgets import OldWorkchainsReport
 __version__ = "v2025.0214"
 
 class ConfigAiiDAlabApp(ipw.VBox): 
-    def __init__(self):
+    def __init__(self, lazy=True):
+        """
+        :param lazy: render the widget right away and load the repository status, the grant dropdowns
+                     and the process panels in background tasks. Without a running event loop the loading is synchronous.
+        """
+        start = time.perf_counter()
+        self.timings = {}  # phase -> seconds, see _run_phase
         self.title = ipw.HTML("<h2>Config AiiDAlab Application</h2>")
 
         style = {'description_width': '150px'}  # Adjust as needed
         
         self.update_message = ipw.HTML("Nothing to report")
-        self.update_old_workchains = ipw.HTML("")
+        self.update_old_workchains = OldWorkchainsReport()
         self.running_workchains = ipw.HTML("")
         self.paused_workchains = ipw.HTML("")
         self.check = True # set to False while applying updates and then set to True again
 
         # Check for updates button
-        self.check_button = ipw.Button(description="Inspect updates", button_style="info")
+        self.check_button = ipw.Button(description="Inspect updates", button_style="info", disabled=True)
         self.check_button.on_click(self.check_for_all_updates)
+        # Full re-inspection: recompare everything, including the computers of the other grants
+        self.full_check = ipw.Checkbox(description="Full re-inspection", value=False, indent=False)
         # Start button
         self.start_button = ipw.Button(description="Apply updates", button_style="primary",disabled=True)
         self.start_button.on_click(self.run_configuration)
@@ -33,14 +48,20 @@ class ConfigAiiDAlabApp(ipw.VBox):
         self.play_button = ipw.Button(description="Play paused workchains", button_style="success",disabled=True)
         self.play_button.on_click(self.play_paused)
 
+        # Details of the computers of the non-selected grants, computed when expanded
+        self.details = ipw.Accordion(children=[])
+        self.details.observe(self.show_details, names='selected_index')
+        self.deferred = []
+
         # Output display
         self.subtitle = ipw.HTML("")
         self.output = ipw.Output()
         
-        # initialize widgets and variables
-        self.config_widgets = self.widgets_from_yaml()
-        some_paused_calculations,self.paused_calculations = self.check_paused_workchains()
-        self.play_button.disabled = not some_paused_calculations
+        # placeholders, filled once the repository and the database are checked
+        self.config_widgets = {}
+        self.config_box = ipw.HBox([ipw.HTML("🔄 Loading configuration...")])
+        self.process_snapshot = None
+        self.paused_calculations = ''
         
         # Call VBox constructor directly
         super().__init__([
@@ -49,16 +70,67 @@ class ConfigAiiDAlabApp(ipw.VBox):
             self.running_workchains,  # Display running workchains
             self.paused_workchains,  # Display paused workchains
             self.update_message,  # Display general updates
-            ipw.HBox([widget for widget in self.config_widgets.values()]),
-            ipw.HBox([self.check_button,self.start_button, self.play_button, self.clear_button]),
+            self.details,  # Details on demand of the non-selected grants
+            self.config_box,
+            ipw.HBox([self.check_button,self.full_check,self.start_button, self.play_button, self.clear_button]),
             self.subtitle,
             self.output
         ])
 
+        loop = running_loop()
+        if lazy and loop is not None:
+            self.update_message.value = "🔄 Checking the repository..."
+            self.running_workchains.value = "🔄 Checking processes..."
+            self.loading = loop.create_task(self._load_in_background())
+        else:
+            self.loading = None
+            self._run_phase("configuration", self._fetch_configuration, self._show_configuration)
+            self._run_phase("processes", get_process_status_snapshot, self._show_processes)
+            self._enable_inspection()
+        self.timings["first_render"] = time.perf_counter() - start
+
         # Start periodic checks
         #asyncio.create_task(self._start_periodic_check_updates(60))
         #asyncio.create_task(self._start_periodic_check_old_workchains(60))
         
+    async def _load_in_background(self):
+        """
+        Fills the placeholders. The repository and config.yml phase (network, git, YAML) runs in a worker thread.
+        The process snapshot queries the database, whose sessions are bound to their thread,
+        so it runs on the event loop once the shell is rendered.
+        """
+        configuration = asyncio.ensure_future(
+            self._run_phase_async("configuration", self._fetch_configuration, self._show_configuration)
+        )
+        await asyncio.sleep(0)  # let the shell render first
+        self._run_phase("processes", get_process_status_snapshot, self._show_processes)
+        await configuration
+        self._enable_inspection()
+
+    def _enable_inspection(self):
+        # only once both phases are done: the processes phase is the one loading the AiiDA profile
+        self.check_button.disabled = not self.config_widgets
+
+    def _run_phase(self, phase, fetch, show):
+        """Runs fetch and shows its result, recording the time of the phase."""
+        start = time.perf_counter()
+        try:
+            show(fetch())
+        except Exception as exc:
+            self.update_message.value = f"❌ Failed to load {phase}: {exc}"
+        finally:
+            self.timings[phase] = time.perf_counter() - start
+
+    async def _run_phase_async(self, phase, fetch, show):
+        """Same as _run_phase with fetch in a worker thread (no database access), the widgets are updated from the event loop."""
+        start = time.perf_counter()
+        try:
+            show(await asyncio.get_running_loop().run_in_executor(None, fetch))
+        except Exception as exc:
+            self.update_message.value = f"❌ Failed to load {phase}: {exc}"
+        finally:
+            self.timings[phase] = time.perf_counter() - start
+
     async def _start_periodic_check_updates(self, interval):
         """Periodically check for updates."""
         while True:
@@ -77,45 +149,64 @@ class ConfigAiiDAlabApp(ipw.VBox):
         """Periodically check for pending too old workchains."""
         while True:
             if self.check:
-                update_result = await asyncio.to_thread(get_old_unfinished_workchains)
-                self.update_old_workchains.value = f"<b>Old WorkChains Check:</b> {update_result}"
+                snapshot = get_process_status_snapshot()  # database session of the loop thread
+                self.update_old_workchains.set_entries(get_old_workchain_candidates(snapshot))
             await asyncio.sleep(interval)
             
                 
     def widgets_from_yaml(self,file_path='/home/jovyan/opt/aiidalab-alps-files/config.yml'):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._show_configuration(self._fetch_configuration(file_path))
+        return self.config_widgets or None
+
+    def _fetch_configuration(self,file_path='/home/jovyan/opt/aiidalab-alps-files/config.yml'):
+        """Repository check and widgets of config.yml, does not touch the widgets."""
         status_ok,msg = check_repository()
+        if not status_ok:
+            return status_ok,msg,{}
+        data, _ = load_config_file(file_path)
+        return status_ok,msg,data.get('widgets', {})
+
+    def _show_configuration(self, result):
+        status_ok,msg,yaml_widgets = result
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         if not status_ok:
             self.update_message.value = f"<b>{timestamp}</b>: ❌ Repository is not cloned"
-            return None
+            self.config_box.children = [ipw.HTML("❌ Configuration not available")]
+            return
         self.update_message.value = f"<b>{timestamp}</b>: {msg}"
-        with open(file_path, 'r') as f:
-            data = yaml.safe_load(f)
-        
-        # Get widgets from the yaml file
-        yaml_widgets = data.get('widgets', {})
-        
         # Create dropdown widgets form teh yamls file
-        widgets = {key: ipw.Dropdown(description=key, options=options) for key, options in yaml_widgets.items()}
-        return widgets        
+        self.config_widgets = {key: ipw.Dropdown(description=key, options=options) for key, options in yaml_widgets.items()}
+        self.config_box.children = list(self.config_widgets.values())
+
+    def _show_processes(self, snapshot):
+        if self.process_snapshot is not None:
+            return  # a newer snapshot was already taken by an inspection
+        self.process_snapshot = snapshot
+        self.running_workchains.value = ""
+        some_paused,self.paused_calculations = self.check_paused_workchains()
+        self.play_button.disabled = not some_paused
     
     def check_paused_workchains(self):
         """Check for paused workchains."""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        some_paused,msg = get_old_unfinished_workchains(cutoffdays=4,reverse=True,paused=True)
+        some_paused,msg = get_old_unfinished_workchains(cutoffdays=4,reverse=True,paused=True,snapshot=self.process_snapshot)
         if msg !='':
             self.paused_workchains.value = f"<b>{timestamp}</b>: There are paused workchains: {msg}"
         return some_paused,msg
     
     def play_paused(self,_):
         self.play_button.disabled = True
-        print(f"AAAAAAA{self.paused_calculations}")
-        if self.paused_calculations != '':
-            output,success = play_paused_workchains(self.paused_calculations)
+
+        def progress(done, total, results):
+            failed = sum(1 for success, _ in results.values() if not success)
+            self.paused_workchains.value = f"🔄 Resuming workchains: {done}/{total} done, {failed} failed"
+
+        output,success = play_paused_workchains(self.paused_calculations, progress=progress)
         if success:
             self.paused_workchains.value = f"<b>{output}</b>: Workchains are resumed"
         else:
             self.paused_workchains.value = f"<b>{output}</b>: Workchains are not resumed, please check"
+            self.play_button.disabled = False  # allow a retry
 
     def check_for_all_updates(self,_):
         status_ok,msg,self.config = get_config(config_widgets=self.config_widgets)
@@ -127,31 +218,65 @@ class ConfigAiiDAlabApp(ipw.VBox):
         if not ssh_key_updated:
             self.update_message.value = f"<b>{timestamp}</b>: ❌ SSH key is not valid, please update it"
             return
-        if msg =='':
-            msg,self.updates_needed = check_for_updates(self.config,self.config_widgets['grant'].value)        
+        # msg only contains warnings here (e.g. unresolved placeholders)
+        warnings = msg
+        full_check = self.full_check.value
+        msg,self.updates_needed,self.deferred = check_for_updates(self.config,self.config_widgets['grant'].value,force=full_check,lazy=not full_check)
+        msg = warnings + msg
+        self.set_details()
         msg = remove_green_check_lines(msg)
         if not msg:
             self.update_message.value = f"<b>{timestamp}</b>: ✅ Nothing to report" 
         else:
             self.update_message.value = f"<b>{timestamp}</b>: {remove_green_check_lines(msg)}"   
-        # check for zombie workcains  
-        someoldzombie,msg = get_old_unfinished_workchains()
-        self.update_old_workchains.value = f"<b>Old WorkChains Check:</b> {msg}"
-        somerunning,msg = get_old_unfinished_workchains(cutoffdays=3,reverse=True)
+        # check for zombie workcains, running and paused ones from a single snapshot
+        self.process_snapshot = get_process_status_snapshot()
+        self.update_old_workchains.set_entries(get_old_workchain_candidates(self.process_snapshot))
+        some_paused,self.paused_calculations = self.check_paused_workchains()
+        self.play_button.disabled = not some_paused
+        somerunning,msg = get_old_unfinished_workchains(cutoffdays=3,reverse=True,snapshot=self.process_snapshot)
         if somerunning:
             self.running_workchains.value = f"<b>There are running workchains, you cannot update:</b> {msg}"
         else:
             self.start_button.disabled = False   
         
+    def set_details(self):
+        """One collapsed entry per computer whose comparison was deferred."""
+        self.details.selected_index = None
+        self.details.children = [ipw.HTML("") for _ in self.deferred]
+        for index, computer in enumerate(self.deferred):
+            self.details.set_title(index, f"Show details: {computer}")
+
+    def show_details(self, change):
+        index = change['new']
+        if index is None or self.details.children[index].value:
+            return
+        self.details.children[index].value = "🔄 Comparing..."
+        msg, updates = computer_details(self.config, self.deferred[index])
+        self.details.children[index].value = msg
+        # the plan of an outdated deferred computer joins the one of the inspection
+        for section, entries in updates.items():
+            self.updates_needed.setdefault(section, {}).update(entries)
+
     def clear_output(self,_):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.output.clear_output()
         self.update_message.value = f"<b>{timestamp}</b>: ✅ Nothing to report"
         self.subtitle.value = ""
         self.paused_workchains.value = ""
+        self.deferred = []
+        self.set_details()
         self.start_button.disabled = True
       
     def run_configuration(self,_):
+        try:
+            self.apply_updates()
+        finally:
+            # tear down the multiplexed ssh masters opened while applying
+            with self.output:
+                close_ssh_sessions(verbose=True)
+
+    def apply_updates(self):
         self.check = False
         self.output.clear_output()
         self.subtitle.value = "<h3>Cloning repository with config files</h3>"
@@ -201,6 +326,13 @@ class ConfigAiiDAlabApp(ipw.VBox):
         self.update_message.value = f"<b>{timestamp}</b>: ✅ Nothing to report" 
         return
 
+def running_loop():
+    """The running event loop (e.g. the one of the Jupyter kernel), None if there is none."""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
 # Example function
 def get_start_widget(appbase, jupbase, notebase):
     return ConfigAiiDAlabApp()  # ✅ Return instance of the class
@@ -0,0 +1,30 @@
+import pytest
+
+from utils import cache_utils
+
+@pytest.fixture(autouse=True)
+def catalog_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_utils, "UENV_CATALOG_FILE", tmp_path / "uenv_catalogs.json")
+
+def test_stored_catalog_is_reused_until_it_expires():
+    before = cache_utils.uenv_cache_stats()
+    assert cache_utils.get_cached_uenv_catalog("daint.alps.cscs.ch", "host") is None
+    cache_utils.store_uenv_catalog("daint.alps.cscs.ch", "host", {"critic2/1.2:1771513358", "cp2k/2025.1:v1"})
+    assert cache_utils.get_cached_uenv_catalog("daint.alps.cscs.ch", "host") == {"critic2/1.2:1771513358", "cp2k/2025.1:v1"}
+    assert cache_utils.get_cached_uenv_catalog("daint.alps.cscs.ch", "host", ttl=-1) is None  # expired
+    after = cache_utils.uenv_cache_stats()
+    assert after['hits'] - before['hits'] == 1
+    assert after['misses'] - before['misses'] == 2
+
+def test_invalidation_by_host_and_kind():
+    for host in ("daint.alps.cscs.ch", "eiger.alps.cscs.ch"):
+        for kind in cache_utils.UENV_CATALOG_KINDS:
+            cache_utils.store_uenv_catalog(host, kind, {f"{kind}-image"})
+    cache_utils.invalidate_uenv_catalog("daint.alps.cscs.ch", "service")
+    assert cache_utils.get_cached_uenv_catalog("daint.alps.cscs.ch", "service") is None
+    assert cache_utils.get_cached_uenv_catalog("daint.alps.cscs.ch", "host") == {"host-image"}
+    cache_utils.invalidate_uenv_catalog("daint.alps.cscs.ch")
+    assert cache_utils.get_cached_uenv_catalog("daint.alps.cscs.ch", "host") is None
+    assert cache_utils.get_cached_uenv_catalog("eiger.alps.cscs.ch", "service") == {"service-image"}
+    cache_utils.invalidate_uenv_catalog()
+    assert cache_utils.get_cached_uenv_catalog("eiger.alps.cscs.ch", "host") is None
@@ -0,0 +1,5 @@
+from utils.import_budget import check_import_budget
+
+def test_headless_modules_import_budget():
+    ok, msg = check_import_budget()
+    assert ok, msg
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+
+from utils.process_utils import classify_process_snapshot, get_old_workchain_candidates
+
+NOW = datetime.now(timezone.utc)
+WORKCHAIN = 'process.workflow.workchain.WorkChainNode.'
+CALCJOB = 'process.calculation.calcjob.CalcJobNode.'
+
+def entry(pk, node_type, age_days, paused=False):
+    return {'id': pk, 'node_type': node_type, 'ctime': NOW - timedelta(days=age_days), 'label': f'process {pk}',
+            'process_state': 'waiting', 'paused': paused}
+
+SNAPSHOT = [
+    entry(1, WORKCHAIN, 45),
+    entry(2, WORKCHAIN, 2),
+    entry(3, WORKCHAIN, 1, paused=True),
+    entry(4, CALCJOB, 60),
+    entry(5, CALCJOB, 1, paused=True),
+    entry(6, WORKCHAIN, 40, paused=True),
+]
+
+def test_old_workchains():
+    assert classify_process_snapshot(SNAPSHOT, cutoffdays=30) == [1, 6]
+    assert [item['id'] for item in get_old_workchain_candidates(SNAPSHOT, cutoffdays=30)] == [1, 6]
+
+def test_recent_workchains():
+    assert classify_process_snapshot(SNAPSHOT, cutoffdays=3, reverse=True) == [2, 3]
+
+def test_recently_paused_processes():
+    assert classify_process_snapshot(SNAPSHOT, cutoffdays=30, paused=True) == [3, 5]
+
+def test_streamed_snapshot():
+    assert classify_process_snapshot(iter(SNAPSHOT), cutoffdays=30) == [1, 6]
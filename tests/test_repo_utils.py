@@ -0,0 +1,50 @@
+import subprocess
+
+import pytest
+
+from utils import repo_utils
+
+def git(*args, cwd):
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd, capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+@pytest.fixture
+def clone(tmp_path, monkeypatch):
+    """Clone of a local remote with one commit on main, used as GIT_REPO_PATH."""
+    work = tmp_path / "work"
+    work.mkdir()
+    git("init", "-b", repo_utils.BRANCH, cwd=work)
+    (work / "config.yml").write_text("computers: {}\n")
+    git("add", "config.yml", cwd=work)
+    git("commit", "-m", "initial", cwd=work)
+    git("clone", "--bare", str(work), str(tmp_path / "remote.git"), cwd=tmp_path)
+    git("clone", (tmp_path / "remote.git").as_uri(), str(tmp_path / "clone"), cwd=tmp_path)
+    monkeypatch.setattr(repo_utils, "GIT_REPO_PATH", tmp_path / "clone")
+    monkeypatch.setattr(repo_utils, "_last_fetch_attempt", 0.0)
+    return tmp_path
+
+def test_fetch_is_rate_limited(clone):
+    assert repo_utils.fetch_remote(interval=600) is True
+    assert repo_utils.fetch_remote(interval=600) is None  # FETCH_HEAD is recent
+    assert repo_utils.fetch_remote(interval=600, force=True) is True
+    assert repo_utils.fetch_remote(interval=0) is True
+
+def test_new_remote_commit_is_pulled_without_network(clone):
+    git("commit", "--allow-empty", "-m", "update", cwd=clone / "work")
+    git("push", str(clone / "remote.git"), repo_utils.BRANCH, cwd=clone / "work")
+    assert repo_utils.fetch_remote(force=True) is True
+    remote_commit = repo_utils.get_latest_remote_commit()
+    assert remote_commit != repo_utils.get_local_commit()
+    assert repo_utils.pull_latest_changes()
+    assert repo_utils.get_local_commit() == remote_commit
+
+def test_unreachable_remote_falls_back_to_the_last_commit(clone):
+    local_commit = repo_utils.get_local_commit()
+    git("remote", "set-url", repo_utils.GIT_REMOTE, (clone / "missing.git").as_uri(), cwd=clone / "clone")
+    assert repo_utils.fetch_remote(interval=600) is False
+    # the failed attempt is rate limited as well, no new timeout at the next check
+    assert repo_utils.fetch_remote(interval=600) is None
+    assert repo_utils.get_local_commit() == local_commit
+    assert repo_utils.get_latest_remote_commit() == local_commit
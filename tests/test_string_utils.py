@@ -0,0 +1,59 @@
+from utils.string_utils import compile_template, compile_tree, render_tree, resolve_variables
+
+COMPUTER = {
+    'setup': {
+        'label': 'daint.alps',
+        'hostname': 'daint.alps.cscs.ch',
+        'transport': 'core.ssh',
+        'scheduler': 'core.slurm',
+        'shebang': '#!/bin/bash -l',
+        'work_dir': '/capstor/scratch/cscs/{username}/aiida/',
+        'mpirun_command': 'srun -n {tot_num_mpiprocs}',
+        'mpiprocs_per_machine': 128,
+        'prepend_text': '#SBATCH --account={grant}\nexport OMP_NUM_THREADS=${SLURM_CPUS_PER_TASK}',
+    },
+    'config': {'username': '{cscs_username}', 'key_filename': '/home/jovyan/.ssh/cscs-key', 'port': 22},
+}
+
+def test_aiida_runtime_placeholders_are_not_reported():
+    unresolved = set()
+    rendered = render_tree(compile_tree(COMPUTER), {'grant': 's1267', 'cscs_username': 'jdoe'}, unresolved)
+    assert unresolved == set()
+    assert rendered['setup']['work_dir'] == '/capstor/scratch/cscs/{username}/aiida/'
+    assert rendered['setup']['mpirun_command'] == 'srun -n {tot_num_mpiprocs}'
+    assert rendered['setup']['prepend_text'] == '#SBATCH --account=s1267\nexport OMP_NUM_THREADS=${SLURM_CPUS_PER_TASK}'
+    assert rendered['config']['username'] == 'jdoe'
+    assert rendered['setup']['mpiprocs_per_machine'] == 128
+
+def test_missing_config_values_are_reported():
+    unresolved = set()
+    rendered = render_tree(compile_tree(COMPUTER), {}, unresolved)
+    assert unresolved == {'grant', 'cscs_username'}
+    assert rendered['config']['username'] == '{cscs_username}'
+
+def test_placeholders_with_dashes_and_dots():
+    unresolved = set()
+    rendered = render_tree(compile_tree({'user': '{cscs-username}', 'account': '{daint.grant}', 'seq': 'seq {1..3}'}),
+                           {'cscs-username': 'jdoe', 'daint.grant': 's1267'}, unresolved)
+    assert rendered == {'user': 'jdoe', 'account': 's1267', 'seq': 'seq {1..3}'}
+    assert unresolved == set()
+
+def test_variables_are_resolved_in_dependency_order():
+    templates = {name: compile_template(text) for name, text in {
+        'scratch': '{base}/aiida',  # refers to a variable defined later
+        'base': '/capstor/scratch/cscs/{cscs_username}',
+        'grant': '{grant}',  # takes the widget with the same name
+    }.items()}
+    unresolved = set()
+    resolved = resolve_variables(templates, {'cscs_username': 'jdoe', 'grant': 's1267'}, unresolved)
+    assert resolved == {'scratch': '/capstor/scratch/cscs/jdoe/aiida', 'base': '/capstor/scratch/cscs/jdoe', 'grant': 's1267'}
+    assert unresolved == set()
+
+def test_every_variable_of_a_cycle_is_unresolved():
+    templates = {name: compile_template(text) for name, text in {
+        'a': '{d}', 'd': 'x{e}', 'e': 'y{f}', 'f': 'z{d}', 'g': '{cscs_username}',
+    }.items()}
+    unresolved = set()
+    resolved = resolve_variables(templates, {'cscs_username': 'jdoe'}, unresolved)
+    assert unresolved == {'d', 'e', 'f'}
+    assert resolved['g'] == 'jdoe'
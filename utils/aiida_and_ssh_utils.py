@@ -1,51 +1,64 @@
-from .string_utils import   normalize_text, relabel,to_camel_case #remove_placeholders
-from datetime import datetime,timedelta
-import subprocess
-import yaml
-import shutil
-import time
-import os
-import re
-from aiida.orm import QueryBuilder, WorkChainNode,Computer,Code, CalcJobNode, StructureData, Node
-from aiida import load_profile
-from aiida.orm import load_node,load_computer
-from aiida.orm import User
+from .string_utils import   normalize_text, relabel, fingerprint #remove_placeholders
+from .ssh_utils import run_command
+from .process_utils import ITERATION_BATCH_SIZE
+from collections import namedtuple
+from types import MappingProxyType
+from aiida.orm import QueryBuilder, Computer, Code
+from aiida.orm import load_computer,load_code
+from aiida.orm import User, InstalledCode, AuthInfo
 from aiida.manage.configuration import get_profile
+from aiida.common.exceptions import NotExistent, MultipleObjectsError
 
-def run_command(command, max_retries=5,verbose=False):
+# Key of the fingerprint of the repository definition stored on computers (metadata) and codes (extras)
+CONFIG_FINGERPRINT_KEY = "config_fingerprint"
+
+def get_computer_setup(computer):
     """
-    Run a shell command locally or over SSH, capturing output and handling errors.
-    Retries on 'Connection closed by remote host' errors.
+    Returns the setup of an AiiDA computer, with the same fields as `verdi computer export setup`.
     """
-    retries = max_retries if any(cmd in command for cmd in ["ssh", "scp", "ssh-keyscan"]) else 1
-    attempts = 0
-
-    while attempts < retries:
-        output, success = "", False
-        try:
-            result = subprocess.run(command, check=True, capture_output=True, text=True)
-            output, success = result.stdout.strip(), True
-            if verbose:
-                print(f"✅ Command executed successfully: {command}")
-            return output, success
-        except subprocess.CalledProcessError as e:
-            error_msg = e.stderr.strip()
-            if verbose:
-                print(f"❌ Error executing command: {error_msg}")
-            
-            if "Connection closed by remote host" in error_msg and attempts < retries - 1:
-                attempts += 1
-                if(verbose):
-                    print(f"🔄 Retrying in 5 seconds... (Attempt {attempts}/{retries})")
-                time.sleep(5)
-            else:
-                return error_msg, False  # Return error message and success=False
+    return {
+        'label': computer.label,
+        'hostname': computer.hostname,
+        'description': computer.description,
+        'transport': computer.transport_type,
+        'scheduler': computer.scheduler_type,
+        'shebang': computer.get_shebang(),
+        'work_dir': computer.get_workdir(),
+        'mpirun_command': ' '.join(computer.get_mpirun_command()),
+        'mpiprocs_per_machine': computer.get_default_mpiprocs_per_machine(),
+        'default_memory_per_machine': computer.get_default_memory_per_machine(),
+        'use_double_quotes': computer.get_use_double_quotes(),
+        'prepend_text': computer.get_prepend_text(),
+        'append_text': computer.get_append_text(),
+    }
+
+def get_computer_config(computer, user=None):
+    """
+    Returns the authinfo configuration of an AiiDA computer for a user (default user if None),
+    with the same fields as `verdi computer export config`.
+    """
+    if user is None:
+        user = User.collection.get(email=get_profile().default_user_email)
+    return computer.get_authinfo(user).get_auth_params()
 
-    return "", False  # Should never reach this
+def find_first_difference(repository_data, aiida_data):
+    """
+    Compares entry by entry the normalized repository values against the AiiDA ones.
+
+    :return: The first entry that differs, None if all entries match.
+    """
+    for entry in repository_data:
+        #str1, str2 = remove_placeholders(normalize_text(str(repository_data[entry])), normalize_text(str(aiida_data.get(entry, ""))))
+        str1 = normalize_text(str(repository_data[entry]))
+        str2 = normalize_text(str(aiida_data.get(entry, "")))
+        if str1 != str2:
+            return entry
+    return None
 
 def compare_computer_configuration(computer_name, repository_computer_data):
     """
     Compares the setup and config of a computer in AiiDA against stored values.
+    Setup and config are read directly from the loaded AiiDA profile.
     """
     repository_setup = repository_computer_data.get("setup", {})
     repository_config = repository_computer_data.get("config", {})
@@ -53,50 +66,82 @@ def compare_computer_configuration(computer_name, repository_computer_data):
     if not repository_setup or not repository_config:
         return False, f"❌ Computer '{computer_name}' not found in config.yml!<br>"
 
-    setup_export_file, config_export_file = "setup.yml", "config.yml"
-    commands = [
-        ["verdi", "computer", "export", "setup", computer_name, setup_export_file],
-        ["verdi", "computer", "export", "config", computer_name, config_export_file]
-    ]
-    
-    for cmd in commands:
-        output, success = run_command(cmd)
-        if not success:
-            return False, f"❌ Error exporting AiiDA computer setup/config: {output}<br>"
-
-    with open(setup_export_file, "r") as file:
-        exported_setup = yaml.safe_load(file)
-    with open(config_export_file, "r") as file:
-        exported_config = yaml.safe_load(file)
+    try:
+        computer = load_computer(computer_name)
+        exported_setup = get_computer_setup(computer)
+        exported_config = get_computer_config(computer)
+    except (NotExistent, MultipleObjectsError) as e:
+        return False, f"❌ Error exporting AiiDA computer setup/config: {e}<br>"
 
-    for entry in repository_setup:
-        #str1, str2 = remove_placeholders(normalize_text(str(repository_setup[entry])), normalize_text(str(exported_setup.get(entry, ""))))
-        str1 = normalize_text(str(repository_setup[entry]))
-        str2 = normalize_text(str(exported_setup.get(entry, "")))
-        if str1 != str2:
-            return False, f"⚠️ **Setup Differences:** {entry}<br>"
+    entry = find_first_difference(repository_setup, exported_setup)
+    if entry is not None:
+        return False, f"⚠️ **Setup Differences:** {entry}<br>"
 
-    for entry in repository_config:
-        #str1, str2 = remove_placeholders(normalize_text(str(repository_config[entry])), normalize_text(str(exported_config.get(entry, ""))))
-        str1 = normalize_text(str(repository_config[entry]))
-        str2 = normalize_text(str(exported_config.get(entry, "")))
-        if str1 != str2:
-            return False, f"⚠️ **Config Differences:** {entry}<br>"
+    entry = find_first_difference(repository_config, exported_config)
+    if entry is not None:
+        return False, f"⚠️ **Config Differences:** {entry}<br>"
 
     return True, "✅ No differences found! The stored configuration matches AiiDA.<br>"
 
-def compare_code_configuration(code_label, repository_code_data):
+def compare_computers_configuration(repository_computers):
     """
-    Compares the setup of an AiiDA code against stored values.
+    Compares many AiiDA computers against stored values.
+    Each comparison is a few ORM reads in the session of the calling thread, so they are simply run in sequence.
+
+    :param repository_computers: dict computer label -> computer data from config.yml
+    :return: dict computer label -> (is_up_to_date, msg), in the order of repository_computers
     """
-    export_file = "export.yml"
-    
-    output, success = run_command(["verdi", "code", "export", code_label, export_file])
-    if not success:
-        return False, f"❌ Error exporting AiiDA code setup: {output}<br>"
+    return {label: compare_computer_configuration(label, data) for label, data in repository_computers.items()}
+
+# QueryBuilder projections of an InstalledCode and the corresponding `verdi code export` fields
+CODE_EXPORT_PROJECTIONS = {
+    'label': 'label',
+    'description': 'description',
+    'filepath_executable': 'attributes.filepath_executable',
+    'default_calc_job_plugin': 'attributes.input_plugin',
+    'prepend_text': 'attributes.prepend_text',
+    'append_text': 'attributes.append_text',
+    'use_double_quotes': 'attributes.use_double_quotes',
+    'with_mpi': 'attributes.with_mpi',
+}
+CODE_EXPORT_DEFAULTS = {'prepend_text': '', 'append_text': '', 'use_double_quotes': False}
+
+def get_installed_codes_setup(computer_labels=None, batch_size=ITERATION_BATCH_SIZE):
+    """
+    Returns the setup of all the visible InstalledCodes with a single QueryBuilder query,
+    with the same fields as `verdi code export`.
+
+    :param computer_labels: Only consider codes on these computers (all computers if None).
+    :param batch_size: Rows fetched per round trip.
+    :return: dict 'label@computer' -> exported setup.
+    """
+    qb = QueryBuilder()
+    qb.append(InstalledCode, tag='code', project=list(CODE_EXPORT_PROJECTIONS.values()) + ['extras.hidden'])
+    computer_filters = {'label': {'in': list(computer_labels)}} if computer_labels is not None else {}
+    qb.append(Computer, with_node='code', filters=computer_filters, project='label')
+    exported_codes = {}
+    for row in qb.iterall(batch_size=batch_size):
+        *values, hidden, computer_label = row
+        if hidden:
+            continue
+        exported_setup = dict(zip(CODE_EXPORT_PROJECTIONS, values))
+        for key, default in CODE_EXPORT_DEFAULTS.items():
+            if exported_setup[key] is None:
+                exported_setup[key] = default
+        exported_setup['computer'] = computer_label
+        exported_codes[f"{exported_setup['label']}@{computer_label}"] = exported_setup
+    return exported_codes
+
+def compare_code_configuration(code_label, repository_code_data, exported_setup=None):
+    """
+    Compares the setup of an AiiDA code against stored values.
 
-    with open(export_file, "r") as file:
-        exported_setup = yaml.safe_load(file)
+    :param exported_setup: Setup of the code as returned by get_installed_codes_setup, queried if None.
+    """
+    if exported_setup is None:
+        exported_setup = get_installed_codes_setup([code_label.partition('@')[2]]).get(code_label)
+    if exported_setup is None:
+        return False, f"❌ Error exporting AiiDA code setup: code {code_label} not found<br>"
 
     for entry in repository_code_data:
         
@@ -110,19 +155,35 @@ def compare_code_configuration(code_label, repository_code_data):
     
     return True, f"✅ No differences found! The stored configuration for {code_label} matches AiiDA.<br>"
 
-def aiida_computers():
+def compare_codes_configuration(repository_codes):
+    """
+    Compares many AiiDA codes against stored values, exporting all of them with one query.
+
+    :param repository_codes: dict 'label@computer' -> code data from config.yml
+    :return: dict 'label@computer' -> (codes_equal, msg)
+    """
+    computer_labels = {code_label.partition('@')[2] for code_label in repository_codes}
+    exported_codes = get_installed_codes_setup(computer_labels) if repository_codes else {}
+    results = {}
+    for code_label, code_data in repository_codes.items():
+        if code_label not in exported_codes:
+            results[code_label] = False, f"❌ Error exporting AiiDA code setup: code {code_label} not found<br>"
+        else:
+            results[code_label] = compare_code_configuration(code_label, code_data, exported_codes[code_label])
+    return results
+
+def aiida_computers(batch_size=ITERATION_BATCH_SIZE):
     result_msg = ""
-    active_computers = set()
-    not_active_computers = set()
     user = User.collection.get(email=get_profile().default_user_email)
+    # Computers with an enabled AuthInfo for the user
     qb = QueryBuilder()
-    qb.append(Computer,project=["label","id"])
-    for comp in qb.all():
-        computer = load_computer(comp[1])
-        if computer.is_user_enabled(user=user):
-            active_computers.add(comp[0])
-        else:
-            not_active_computers.add(comp[0])
+    qb.append(Computer, tag='computer', project="label")
+    qb.append(AuthInfo, with_computer='computer', filters={'aiidauser_id': user.pk, 'enabled': True})
+    active_computers = {comp[0] for comp in qb.iterall(batch_size=batch_size)}
+    # All the others are not active (disabled or not configured)
+    qb = QueryBuilder()
+    qb.append(Computer, project="label")
+    not_active_computers = {comp[0] for comp in qb.iterall(batch_size=batch_size)} - active_computers
 
     result_msg += f"✅ Active AiiDA computers: {'<br>'.join([f'✅{comp}' for comp in active_computers])}"
     result_msg += "<br>"
@@ -131,19 +192,29 @@ def aiida_computers():
 
     return True, result_msg, active_computers, not_active_computers
 
-def aiida_codes():
+def iter_aiida_codes(batch_size=ITERATION_BATCH_SIZE):
+    """
+    Streams the AiiDA codes with their computer label.
+
+    :return: generator of (label, pk, hidden, mtime, stored config fingerprint, computer label)
+    """
+    qb = QueryBuilder()
+    qb.append(Code, tag='code', project=["label", "id", "extras.hidden", "mtime", f"extras.{CONFIG_FINGERPRINT_KEY}"])
+    qb.append(Computer, with_node='code', project="label")
+    yield from qb.iterall(batch_size=batch_size)
+
+def aiida_codes(batch_size=ITERATION_BATCH_SIZE):
     result_msg = ""
     active_codes = set()
     not_active_codes = set()
+    code_info = {}
 
-    qb = QueryBuilder()
-    qb.append(Code,project="id")
-    for code in qb.all():
-        the_code=load_node(code[0])
-        if the_code.is_hidden:
-            not_active_codes.add((the_code.label,the_code.computer.label,code[0]))
+    for label, pk, hidden, mtime, stored_fingerprint, computer_label in iter_aiida_codes(batch_size=batch_size):
+        code_info[pk] = (mtime.isoformat(), stored_fingerprint)
+        if hidden:
+            not_active_codes.add((label,computer_label,pk))
         else:
-            active_codes.add((the_code.label,the_code.computer.label,code[0]))
+            active_codes.add((label,computer_label,pk))
             
     active_section = ('<br>'.join([f"✅ {code[0]}  PK: {str(code[1])}" for code in (active_codes or [])]) if active_codes else "None")
     not_active_section = ('<br>'.join([f"✅⬜{code[0]} PK: {str(code[1])}" for code in (not_active_codes or [])]) if not_active_codes else "None")
@@ -153,18 +224,87 @@ def aiida_codes():
     result_msg += "<br>"
     result_msg += f"✅⬜ Not active AiiDA codes:<br> {not_active_section}"
     result_msg += "<br>"
-    return True, result_msg, active_codes, not_active_codes
+    return True, result_msg, active_codes, not_active_codes, code_info
+
+def aiida_computer_states(batch_size=ITERATION_BATCH_SIZE):
+    """
+    Fingerprints of the setup and authinfo of the computers configured for the default user, from one query.
+    Computers have no mtime: the fingerprint changes whenever their setup or configuration is modified.
 
+    :return: (dict computer label -> state fingerprint, dict computer label -> stored config fingerprint)
+    """
+    user = User.collection.get(email=get_profile().default_user_email)
+    qb = QueryBuilder()
+    qb.append(Computer, tag='computer', project=["label", "hostname", "description", "transport_type", "scheduler_type", "metadata"])
+    qb.append(AuthInfo, with_computer='computer', filters={'aiidauser_id': user.pk}, project=["auth_params", "enabled"])
+    states, stored_fingerprints = {}, {}
+    for row in qb.iterall(batch_size=batch_size):
+        states[row[0]] = fingerprint(row)
+        stored_fingerprints[row[0]] = (row[5] or {}).get(CONFIG_FINGERPRINT_KEY)
+    return states, stored_fingerprints
+
+# Immutable snapshot of the AiiDA computers and codes, built once per inspection.
+# *_computers are frozensets of labels, *_codes frozensets of (label, computer, pk),
+# *_code_pks read-only dicts 'label@computer' -> pk, code_mtimes pk -> mtime (isoformat),
+# computer_states computer label -> fingerprint of its setup and authinfo, and
+# code_fingerprints/computer_fingerprints the config fingerprints stored at setup (pk/label -> fingerprint).
+AiidaInventory = namedtuple("AiidaInventory", [
+    "active_computers", "not_active_computers",
+    "active_codes", "not_active_codes",
+    "active_code_pks", "not_active_code_pks",
+    "code_mtimes", "computer_states",
+    "code_fingerprints", "computer_fingerprints",
+])
+
+def aiida_inventory():
+    """
+    Collects the AiiDA computers and codes in an indexed AiidaInventory snapshot.
 
-def setup_aiida_computer(computer_name, config, hide=False, torelabel=False, install=False, grant=''):
+    :return: (status, result_msg, inventory)
+    """
+    status_computers, msg_computers, active_computers, not_active_computers = aiida_computers()
+    status_codes, msg_codes, active_codes, not_active_codes, code_info = aiida_codes()
+    computer_states, computer_fingerprints = aiida_computer_states()
+    inventory = AiidaInventory(
+        active_computers=frozenset(active_computers),
+        not_active_computers=frozenset(not_active_computers),
+        active_codes=frozenset(active_codes),
+        not_active_codes=frozenset(not_active_codes),
+        active_code_pks=MappingProxyType({f"{label}@{computer}": pk for label, computer, pk in active_codes}),
+        not_active_code_pks=MappingProxyType({f"{label}@{computer}": pk for label, computer, pk in not_active_codes}),
+        code_mtimes=MappingProxyType({pk: info[0] for pk, info in code_info.items()}),
+        computer_states=MappingProxyType(computer_states),
+        code_fingerprints=MappingProxyType({pk: info[1] for pk, info in code_info.items()}),
+        computer_fingerprints=MappingProxyType(computer_fingerprints),
+    )
+    return status_computers and status_codes, msg_computers + msg_codes, inventory
+
+
+def store_config_fingerprint(entity, config):
+    """
+    Stores the fingerprint of the repository definition config on a Computer (metadata) or Code (extras),
+    so that later inspections can detect configuration drift without a field by field comparison.
+    """
+    if isinstance(entity, Computer):
+        entity.set_property(CONFIG_FINGERPRINT_KEY, fingerprint(config))
+    else:
+        entity.base.extras.set(CONFIG_FINGERPRINT_KEY, fingerprint(config))
+
+def verdi_command(*args, profile=None):
+    """`verdi` command line, on the given AiiDA profile instead of the default one if set."""
+    return ["verdi"] + (["-p", profile] if profile else []) + list(args)
+
+def setup_aiida_computer(computer_name, config, hide=False, torelabel=False, install=False, grant='', profile=None):
     """
     Sets up an AiiDA computer using `verdi computer setup` and configures SSH.
+
+    :param profile: AiiDA profile of the verdi commands, the default profile if None. Must be the loaded one.
     """
 
     relabeled = relabel(computer_name) if torelabel else computer_name
-    commands = [["verdi", "computer", "relabel", computer_name, relabeled]] if torelabel else []    
+    commands = [verdi_command("computer", "relabel", computer_name, relabeled, profile=profile)] if torelabel else []    
     if hide:
-        commands.append(["verdi", "computer", "disable", relabeled, "aiida@localhost"])
+        commands.append(verdi_command("computer", "disable", relabeled, "aiida@localhost", profile=profile))
         
     for command in commands:
         output, success = run_command(command)
@@ -176,8 +316,7 @@ def setup_aiida_computer(computer_name, config, hide=False, torelabel=False, ins
     if install:
         setup = config["setup"]
         ssh_config = config["config"]
-        setup_command = [
-            "verdi", "computer", "setup",
+        setup_command = verdi_command("computer", "setup", profile=profile) + [
             "--label", computer_name,
             "--hostname", setup["hostname"],
             "--description", setup["description"],
@@ -198,8 +337,7 @@ def setup_aiida_computer(computer_name, config, hide=False, torelabel=False, ins
             return False
         print(f"✅ Successfully set up computer '{computer_name}'.")
         
-        configure_command = [
-            "verdi", "computer", "configure", setup["transport"], computer_name,
+        configure_command = verdi_command("computer", "configure", setup["transport"], computer_name, profile=profile) + [
             "--username", ssh_config["username"],
             "--port", str(ssh_config["port"]),
             "--look-for-keys" if ssh_config["look_for_keys"] else "--no-look-for-keys",
@@ -232,33 +370,35 @@ def setup_aiida_computer(computer_name, config, hide=False, torelabel=False, ins
             print(f"❌ Error configuring SSH for computer '{computer_name}': {output}")
             return False
         print(f"✅ Successfully configured SSH for computer '{computer_name}'.")        
+        store_config_fingerprint(load_computer(computer_name), config)
     
         
     return True
 
-def setup_aiida_code(code_name, code_config, hide=False, pktorelabel=False, install=False):
+def setup_aiida_code(code_name, code_config, hide=False, pktorelabel=False, install=False, profile=None):
     """
     Sets up an AiiDA code using `verdi code create core.code.installed`.
+
+    :param profile: AiiDA profile of the verdi commands, the default profile if None. Must be the loaded one.
     """
     # code_name pw-7.4:v2@daint.alps_s1267
     code = code_name.split("@")[0]
     computer = code_name.split("@")[1]
     relabeled = relabel(code) if pktorelabel else code
     if pktorelabel:
-        output, success = run_command(["verdi", "code", "relabel", str(pktorelabel), relabeled])
+        output, success = run_command(verdi_command("code", "relabel", str(pktorelabel), relabeled, profile=profile))
         if not success:
             print(f"❌ Error relabelling '{code_name}': {output}")
             return False
     
     if hide:
-        output, success = run_command(["verdi", "code", "hide", str(pktorelabel)])
+        output, success = run_command(verdi_command("code", "hide", str(pktorelabel), profile=profile))
         if not success:
             print(f"❌ Error hiding code '{code_name}': {output}")
             return False
     
     if install:
-        code_command = [
-            "verdi", "code", "create", "core.code.installed",
+        code_command = verdi_command("code", "create", "core.code.installed", profile=profile) + [
             "--computer", computer, 
             "--filepath-executable", code_config["filepath_executable"],
             "--label", code, #relabeled,
@@ -273,313 +413,5 @@ def setup_aiida_code(code_name, code_config, hide=False, pktorelabel=False, inst
             print(f"❌ Error setting up code '{code_name}': {output}")
             return False
         print(f"✅ Successfully set up code '{code_name}'.")
+        store_config_fingerprint(load_code(f"{code}@{computer}"), code_config)
     return True
-        
-def check_ssh_config(config_path, config_from_yaml):
-    config_file = config_path / "config"
-    msg=""
-    reconfigure=[]
-    all_up_to_date = True
-    # Read the content of the config file
-    try:
-        with open(config_file, "r") as f:
-            config_content = f.read()
-            config_exist=True
-    except FileNotFoundError:
-        config_exist=False
-        msg += f"Config file {config_file} not found. I will create it.<br>"
-    
-    for computer, details in config_from_yaml.items():
-        setup = details.get("setup", {})
-        config = details.get("config", {})
-
-        hostname = setup.get("hostname")
-        proxy_jump = config.get("proxy_jump", "")
-        proxy_string = "Host " + proxy_jump if proxy_jump else ""
-
-        # Check if hostname is in the config file
-        need_to_update = True
-        if config_exist:
-            hostname_check = hostname in config_content if hostname else False
-            proxy_check = proxy_string in config_content if proxy_jump else True  # Skip if empty
-            need_to_update = not (hostname_check and proxy_check)
-
-        if need_to_update:
-            all_up_to_date = False
-            if config_exist:
-                msg+=f"⚠️{hostname} not properly configured in .ssh/config.<br>"
-            reconfigure.append(computer)
-    if msg == "":
-        msg = "✅ The .ssh/config seems to be OK.<br>"
-    
-    return all_up_to_date, msg, reconfigure
-
-def update_ssh_config(config_path,ssh_config_data,rename=True):
-    
-    # Ensure config_path exists
-    config_path.mkdir(parents=True, exist_ok=True)
-
-    # Define file paths
-    config_file = config_path / "config"
-    old_config_file = config_path / relabel("config") 
-          
-    if rename:
-        shutil.move(config_file, old_config_file)
-        print(f"✅ Renamed {config_file} → {old_config_file}")
-        
-    file_content = ""
-    for host in ssh_config_data:
-        #ssh_config_data[host]['user'] = username
-        file_content += f"Host {host}\n"
-        for key, value in ssh_config_data[host].items():
-            file_content += f"  {to_camel_case(key)} {value}\n"  # Capitalize the first letter of key
-        file_content += "\n"
-
-
-    with open(config_file, "w") as file:
-        file.write(file_content + "\n")  # Ensure a newline at the end
-
-    print(f"✅ Created new SSH config at {config_file}")
-    return
-
-def set_ssh(config, hosts):
-    """
-    Adds SSH host keys to known_hosts for the specified hosts.
-
-    Args:
-        config (dict): SSH configuration details from YAML.
-        hosts (list): List of hosts to update in known_hosts.
-
-    Returns:
-        bool: True if SSH check succeeds, False otherwise.
-    """
-    
-    for computer in hosts:
-        proxy = config[computer]["config"].get("proxy_jump", "")
-        remotehost = config[computer]["setup"]["hostname"]
-
-        if proxy:
-            print(f"🔄 Adding {proxy} to known_hosts...")
-            ssh_keyscan_command = ["ssh-keyscan", "-H", proxy]
-            add_to_known_hosts(ssh_keyscan_command)
-
-            print(f"🔄 Adding {remotehost} via {proxy} to known_hosts...")
-            ssh_keyscan_command = ["ssh", proxy, "ssh-keyscan", "-H", remotehost]
-            add_to_known_hosts(ssh_keyscan_command)
-        else:
-            print(f"🔄 Adding {remotehost} to known_hosts...")
-            ssh_keyscan_command = ["ssh-keyscan", "-H", remotehost]
-            add_to_known_hosts(ssh_keyscan_command)
-
-    # Check if SSH works by listing the remote directory
-    ssh_check_command = ["ssh", remotehost, "ls"]
-    command_out, command_ok = run_command(ssh_check_command)
-
-    return command_ok
-
-
-def add_to_known_hosts(ssh_keyscan_command):
-    """
-    Runs ssh-keyscan and appends the output to ~/.ssh/known_hosts.
-
-    Args:
-        ssh_keyscan_command (list): The command to run (split properly).
-
-    Returns:
-        bool: True if the command succeeds, False otherwise.
-    """
-    try:
-        with open(os.path.expanduser("~/.ssh/known_hosts"), "a") as f:
-            known_host, success = run_command(ssh_keyscan_command)
-            if success:
-                f.write(known_host + "\n")
-        return True  # Success
-
-    except subprocess.CalledProcessError as e:
-        error_msg = e.stderr.strip() if e.stderr else "Unknown error (no stderr output)"
-        print(f"❌ Error adding to known_hosts: {error_msg}")
-    
-    return False  # Failure
-
-def execute_custom_commands(yaml_commands):
-    """Execute all commands from custom_commands in the YAML file."""    
-    if "custom_commands" not in yaml_commands:
-        print("❌ No custom commands found in YAML file. Exiting.")
-        return False
-    
-    # Execute remote computer commands
-    remote_commands = yaml_commands["custom_commands"].get("remote_commands", {})
-    remotehost = remote_commands.pop('remotehost') # remove the remotehost from the dictionary after assigning it
-    for setup_name, commands in remote_commands.items():
-        print(f"🔄 Executing remote commands for {setup_name} on {remotehost}...")
-        for entry in commands:
-            formatted_command = entry["command"]
-            remote_command = ["ssh", remotehost, formatted_command] if entry["type"] == "ssh" else formatted_command.split()
-            output, success = run_command(remote_command)
-            if not success:
-                print(f"❌ Failed to execute: {entry['type']} {formatted_command}. Exiting, ask for help.")
-                return False
-    return True
-    
-def parse_validity_time(public_key_file):
-    """Parse the validity time from the output."""
-    output = subprocess.run(
-        ["ssh-keygen", "-L", "-f", public_key_file],
-        encoding="utf-8",
-        capture_output=True,
-    ).stdout
-
-    matched_line = (
-        re.search(r"^.*{}.*$".format("Valid:"), output, flags=re.MULTILINE)
-        .group(0)
-        .split()
-    )
-    start = datetime.fromisoformat(matched_line[2])
-    end = datetime.fromisoformat(matched_line[4])
-    return start, end
-
-def key_is_valid(public_key_file = ''):
-    """Check if the key is valid."""
-    start, end = parse_validity_time(public_key_file)
-    if start < datetime.now() < end:
-        return True
-    else:
-        return False
-    
-#### CHECK for old unfinished Workchains
-def first_caller(node_pk, max_calls=5000):
-    """
-    Traces back to the first caller (root node) of a given node.
-    
-    :param node_pk: The PK of the node.
-    :param max_calls: Maximum recursion depth to prevent infinite loops.
-    :return: PK of the first caller.
-    """
-    num_calls = 0
-    caller = node_pk
-    while num_calls < max_calls:
-        try:
-            caller = load_node(caller).caller.pk
-        except AttributeError:
-            break  # No more parents, stop tracing
-        num_calls += 1
-    return caller
-
-def get_structuredata_descendants(parent_pk):
-    """
-    Returns all StructureData nodes that are descendants of a given node.
-    
-    :param parent_pk: The PK of the parent node (e.g., WorkChain PK).
-    :return: A list of StructureData node PKs.
-    """
-    qb = QueryBuilder()
-    qb.append(Node, filters={'id': parent_pk}, tag='parent')
-    qb.append(
-        StructureData, 
-        with_ancestors='parent',  # Search for descendants
-        project=['id']  # Retrieve PKs only
-    )
-    return [entry[0] for entry in qb.all()]
-
-def get_processes_with_structuredata_input(structure_pks):
-    """
-    Returns all CalcJob, WorkChain, and CalcFunction nodes that have 
-    a given StructureData node as an input.
-    
-    :param structure_pks: List of StructureData PKs.
-    :return: A list of process node PKs.
-    """
-    if not structure_pks:
-        return []
-    
-    qb = QueryBuilder()
-    qb.append(StructureData, filters={'id': {'in': structure_pks}}, tag='structure')
-    qb.append(
-        Node, 
-        with_incoming='structure',  # Find nodes that receive the StructureData as input
-        filters={'node_type': {'in': [
-            'process.calculation.calcjob.CalcJobNode.',
-            'process.workflow.workchain.WorkChainNode.',
-            'process.calculation.function.CalcFunctionNode.'
-        ]}},
-        project=['id']  # Retrieve PKs only
-    )
-    return [entry[0] for entry in qb.all()]
-
-def safe_to_delete(workchain_pk):
-    """
-    Determines if a WorkChainNode can be safely deleted.
-    
-    :param workchain_pk: The PK of the WorkChainNode.
-    :return: True if it can be safely removed, False otherwise.
-    """
-    structure_pks = get_structuredata_descendants(workchain_pk)
-    calcjobs = get_processes_with_structuredata_input(structure_pks)
-    
-    for job in calcjobs:
-        if first_caller(job) != workchain_pk:
-            return False
-    return True
-
-def get_old_unfinished_workchains(cutoffdays=30,reverse=False,paused=False):
-    """
-    Returns a formatted message with all WorkChainNodes that are older than 30 days and unfinished.
-    
-    :return: HTML formatted message with green (✅) and red (❌) indicators.
-    """
-    nodes = [WorkChainNode]
-    project = ['id']
-    if not load_profile():
-        load_profile("default")
-    cutoff_date = datetime.now() - timedelta(days=cutoffdays)
-    filters = {
-            'ctime': {'<': cutoff_date},  # Created more than x days ago
-            'attributes.process_state': {'!in': ['finished', 'excepted', 'killed']}  # Not finished
-        }
-    if reverse:
-        filters = {
-            'ctime': {'>': cutoff_date},  # Created less than x days ago
-            'attributes.process_state': {'!in': ['finished', 'excepted','killed']}  # Running or waiting
-        }
-    if paused:     
-        nodes = [WorkChainNode, CalcJobNode]  
-        project = ['id','attributes.paused'] 
-        filters = {
-            'ctime': {'>': cutoff_date},  # Created less than x days ago
-            'attributes.process_state': {'!in': ['finished', 'excepted','killed']},# Running or waiting
-            'attributes.paused': True  # Paused
-        }
-    qb = QueryBuilder()
-    qb.append(
-        nodes, 
-        filters=filters,
-        project=project  # Retrieve PKs only
-    )
-    
-    old_unfinished = [entry[0] for entry in qb.all()]
-    if not old_unfinished:
-        return False,"<style='color: green;'>✅ No old unfinished WorkChainNodes found.<br>"
-    
-    if paused:
-        msg = ' '.join(str(num) for num in old_unfinished)
-        return True,msg
-    msg = "<style='color: darkorange;'>⚠️ Found old unfinished WorkChains<br>"
-    msg += "<p>Ask for help if you are unsure about removing them.</p><ul>"
-    
-    for pk in old_unfinished:
-        if safe_to_delete(pk):
-            msg += f"<li style='color: green;'>✅ WorkChain <strong>PK {pk}</strong> can be safely removed.</li>"
-        else:
-            msg += f"<li style='color: red;'>❌ WorkChain <strong>PK {pk}</strong> cannot be safely removed.</li>"
-    
-    msg += "</ul>"
-    return True,msg
-def play_paused_workchains(paused_workchains):
-    """
-    Replays paused workchains.
-    
-    :param paused_workchains: string of paused workchain PKs.
-    """
-    if not paused_workchains:
-        return "No paused workchains to play.",True
-    return run_command(["verdi", "process", "play"]+ paused_workchains.split())
\ No newline at end of file
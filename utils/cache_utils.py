@@ -0,0 +1,136 @@
+import contextlib
+import fcntl
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from .repo_utils import CACHE_DIR
+
+# Catalogs of uenv images (`uenv image find`) change rarely: keep them on disk for a while
+UENV_CATALOG_FILE = CACHE_DIR / "uenv_catalogs.json"
+UENV_CATALOG_TTL = 24 * 3600  # seconds
+UENV_CATALOG_KINDS = ("host", "service")
+
+# Parsed and validated config.yml, keyed by repository commit and file mtime
+CONFIG_CACHE_FILE = CACHE_DIR / "config_cache.pickle"
+
+# Verdicts of the last inspection, per AiiDA profile
+INSPECTION_CACHE_FILE = CACHE_DIR / "inspection_cache.json"
+
+_uenv_cache_lock = threading.Lock()
+_uenv_cache_stats = {'hits': 0, 'misses': 0}
+
+def load_json_cache(cache_file):
+    """Read a JSON cache file, returns {} if it is missing or corrupted."""
+    try:
+        with open(cache_file, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_json_cache(cache_file, data):
+    """Atomically write a JSON cache file."""
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(dir=cache_file.parent, prefix=cache_file.name)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+@contextlib.contextmanager
+def locked_cache(cache_file):
+    """Exclusive lock on a cache file across processes, for read-modify-write updates."""
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_file.with_name(cache_file.name + ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def load_pickle_cache(cache_file):
+    """Read a pickle cache file written by save_pickle_cache, returns None if it is missing or corrupted."""
+    try:
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+def save_pickle_cache(cache_file, data):
+    """Atomically write a pickle cache file."""
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(dir=cache_file.parent, prefix=cache_file.name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(data, f)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+def get_cached_uenv_catalog(host, kind, ttl=UENV_CATALOG_TTL):
+    """
+    Returns the cached set of images of a uenv catalog.
+
+    :param host: The remote host.
+    :param kind: 'host' (system-wide) or 'service' (service::).
+    :param ttl: Maximum age in seconds of a usable entry.
+    :return: set of image names, or None if not cached or expired.
+    """
+    with _uenv_cache_lock:
+        entry = load_json_cache(UENV_CATALOG_FILE).get(host, {}).get(kind)
+        if entry is None or time.time() - entry['timestamp'] > ttl:
+            _uenv_cache_stats['misses'] += 1
+            return None
+        _uenv_cache_stats['hits'] += 1
+        return set(entry['images'])
+
+def store_uenv_catalog(host, kind, images):
+    """Stores the parsed set of images of a uenv catalog."""
+    with _uenv_cache_lock:
+        data = load_json_cache(UENV_CATALOG_FILE)
+        data.setdefault(host, {})[kind] = {'timestamp': time.time(), 'images': sorted(images)}
+        save_json_cache(UENV_CATALOG_FILE, data)
+
+def invalidate_uenv_catalog(host=None, kind=None):
+    """
+    Drops cached uenv catalogs.
+
+    :param host: Only drop the catalogs of this host (all hosts if None).
+    :param kind: Only drop this kind of catalog (all kinds if None).
+    """
+    with _uenv_cache_lock:
+        data = load_json_cache(UENV_CATALOG_FILE)
+        for cached_host in [host] if host is not None else list(data):
+            if kind is None:
+                data.pop(cached_host, None)
+            else:
+                data.get(cached_host, {}).pop(kind, None)
+        save_json_cache(UENV_CATALOG_FILE, data)
+
+def uenv_cache_stats():
+    """Returns the hit and miss counters of the uenv catalog cache."""
+    with _uenv_cache_lock:
+        return dict(_uenv_cache_stats)
+
+def load_inspection_cache(profile):
+    """
+    Returns the verdicts recorded by the last inspection of an AiiDA profile.
+
+    :return: dict {'commit': config commit, 'computers': {label: record}, 'codes': {label: record}}
+             where a record is {'fingerprint': ..., 'state': ..., 'verdict': [ok, msg]}
+    """
+    cache = load_json_cache(INSPECTION_CACHE_FILE).get(profile, {})
+    return {'commit': cache.get('commit'), 'computers': cache.get('computers', {}), 'codes': cache.get('codes', {})}
+
+def save_inspection_cache(profile, cache):
+    """Records the verdicts of an inspection of an AiiDA profile, profiles may be inspected by parallel processes."""
+    with locked_cache(INSPECTION_CACHE_FILE):
+        data = load_json_cache(INSPECTION_CACHE_FILE)
+        data[profile] = cache
+        save_json_cache(INSPECTION_CACHE_FILE, data)
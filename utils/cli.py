@@ -0,0 +1,257 @@
+"""
+Headless inspection and application of the configuration, for cron jobs and fleet-wide runs.
+
+    python -m utils.cli --grant s1267 [--set KEY=VALUE ...] [--apply] [--profile NAME ... | --all-profiles]
+
+Prints a JSON report (plan, and result with --apply) on stdout, the logs of the setup steps go to stderr.
+Exit codes: 0 up to date or applied, 1 error, 2 usage error, 3 updates pending, 4 blocked by running workchains.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from aiida import load_profile
+from aiida.manage.configuration import get_config as get_aiida_config, get_profile
+from .control import (
+    check_repository, get_config, load_config_file, process_aiida_configuration, setup_computers, setup_codes,
+    manage_uenv_images, config_path, configuration_file,
+)
+from .repo_utils import get_local_commit
+from .ssh_utils import check_ssh_config, update_ssh_config, set_ssh, key_is_valid, close_ssh_sessions, execute_custom_commands
+from .string_utils import remove_green_check_lines
+from .process_utils import iter_process_status, classify_process_snapshot
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_UPDATES_PENDING = 3
+EXIT_BLOCKED = 4
+STATUS_EXIT_CODES = {'ok': EXIT_OK, 'updates_pending': EXIT_UPDATES_PENDING, 'blocked': EXIT_BLOCKED, 'error': EXIT_ERROR,
+                     'usage': EXIT_USAGE}
+STATUS_SEVERITY = ['ok', 'updates_pending', 'blocked', 'error', 'usage']  # the worst status decides the exit code
+
+FLEET_MAX_WORKERS = 4  # profiles handled at the same time
+RUNNING_CUTOFF_DAYS = 3  # as in the app, workchains running since less than this block the updates
+
+def html_lines(msg):
+    """Plain text lines of an HTML formatted message."""
+    text = re.sub(r"<br\s*/?>|</li>|</p>", "\n", msg)
+    text = re.sub(r"<[^>]+>", "", text)
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def pending_changes(updates_needed):
+    """
+    The updates that change AiiDA (install, rename or hide). The uenv checks of up-to-date codes
+    ({'checkuenv': True}) are not pending changes, they run with --apply.
+    The SSH config is shared by all the profiles, see prepare_host.
+    """
+    changes = {}
+    for section, entries in updates_needed.items():
+        if section == 'ssh_config':
+            continue
+        section_changes = {label: update for label, update in entries.items()
+                           if any(update.get(key) for key in ('install', 'rename', 'hide'))}
+        if section_changes:
+            changes[section] = section_changes
+    return changes
+
+def worst_status(*statuses):
+    return max(statuses, key=STATUS_SEVERITY.index)
+
+def prepare_host(widget_values, file_path=configuration_file, apply=False):
+    """
+    Steps shared by all the profiles of the container: repository, config.yml, SSH key and SSH config.
+
+    :param widget_values: dict key -> value of the widgets of config.yml (e.g. {'grant': 's1267'}).
+    :return: (status, list of messages, rendered configuration)
+    """
+    messages = []
+    status_ok, msg = check_repository()
+    messages += html_lines(msg)
+    if not status_ok:
+        return 'error', messages, {}
+    # as in the app, every widget of config.yml must be selected
+    data, _ = load_config_file(file_path)
+    missing = [key for key in data.get('widgets', {}) if widget_values.get(key) in (None, '', 'select')]
+    if missing:
+        messages.append(f"❌ No value for the widgets {', '.join(missing)}, pass them with --grant/--set KEY=VALUE")
+        return 'usage', messages, {}
+    status_ok, msg, config = get_config(file_path, widget_values, check_repo=False)
+    messages += html_lines(msg)
+    if not status_ok:
+        return 'error', messages, {}
+    try:
+        key_ok = key_is_valid(public_key_file=config['variables']['ssh_public_key'])
+    except (KeyError, AttributeError, ValueError, OSError):
+        key_ok = False
+    if not key_ok:
+        messages.append("❌ SSH key is not valid, please update it")
+        return 'error', messages, config
+
+    ssh_ok, msg, hosts = check_ssh_config(config_path, config['computers'])
+    messages += html_lines(msg)
+    if ssh_ok:
+        return 'ok', messages, config
+    if not apply:
+        return 'updates_pending', messages, config
+    update_ssh_config(config_path, config['ssh_config'], rename='not properly' in msg)
+    if not set_ssh(config['computers'], hosts):
+        messages.append("❌ ssh problem, ask for support")
+        return 'error', messages, config
+    messages.append("✅ ssh setup done")
+    return 'ok', messages, config
+
+def run_profile(profile, config, selected_grant, apply=False, force=False, lazy=False):
+    """
+    Inspects, and with apply sets up, the computers and codes of one AiiDA profile.
+    In fleet mode it runs in its own worker process, with its own loaded profile; the verdi commands of the
+    setup are run with `verdi -p` on that profile.
+
+    :param profile: Name of the AiiDA profile, None for the default one.
+    :param config: Configuration rendered by get_config.
+    :return: dict with the status, messages, updates_needed, deferred computers, uenvs to pull and
+             whether updates were applied.
+    """
+    result = {'profile': profile, 'status': 'error', 'messages': [], 'updates_needed': {}, 'deferred': [], 'uenvs': [], 'applied': False}
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            load_profile(profile, allow_switch=True)
+            result['profile'] = get_profile().name
+            _run_profile(result, config, selected_grant, apply, force, lazy)
+        except Exception as exc:
+            result['status'] = 'error'
+            result['messages'].append(f"❌ {type(exc).__name__}: {exc}")
+    return result
+
+def _run_profile(result, config, selected_grant, apply, force, lazy):
+    status, msg, updates_needed, deferred = process_aiida_configuration(config, config_path, selected_grant, force=force, lazy=lazy)
+    result['messages'] += html_lines(remove_green_check_lines(msg))
+    if not status:
+        return
+    result.update(updates_needed=updates_needed, deferred=deferred)
+    changes = pending_changes(updates_needed)
+    if not apply:
+        result['status'] = 'updates_pending' if changes else 'ok'
+        return
+
+    if changes:
+        running = classify_process_snapshot(iter_process_status(), cutoffdays=RUNNING_CUTOFF_DAYS, reverse=True)
+        if running:
+            result['messages'].append(f"❌ There are running workchains, you cannot update: {' '.join(map(str, running))}")
+            result['status'] = 'blocked'
+            return
+    profile = result['profile']
+    if not setup_computers(changes.get('computers', {}), config['computers'], profile=profile):
+        result['messages'].append("❌ Computers not set up correctly, ask for help")
+        return
+    # all the code entries: the up-to-date ones only have their uenv checked
+    status, uenvs = setup_codes(updates_needed.get('codes', {}), config, profile=profile)
+    result['uenvs'] = uenvs
+    if not status:
+        result['messages'].append("❌ Codes not set up correctly, ask for help")
+        return
+    result.update(status='ok', applied=bool(changes))
+
+def run_fleet(profiles, config, selected_grant, apply=False, force=False, lazy=False, max_workers=FLEET_MAX_WORKERS):
+    """
+    Runs run_profile for every profile, in parallel worker processes when there is more than one.
+
+    :return: list of the results of run_profile, in the order of profiles.
+    """
+    if len(profiles) == 1:
+        return [run_profile(profiles[0], config, selected_grant, apply, force, lazy)]
+    context = multiprocessing.get_context("spawn")  # fresh interpreters, no profile inherited from the parent
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(profiles)), mp_context=context) as pool:
+        futures = [pool.submit(run_profile, profile, config, selected_grant, apply, force, lazy) for profile in profiles]
+    results = []
+    for profile, future in zip(profiles, futures):
+        try:
+            results.append(future.result())
+        except Exception as exc:  # the worker died
+            results.append({'profile': profile, 'status': 'error', 'messages': [f"❌ Worker failed: {exc}"],
+                            'updates_needed': {}, 'deferred': [], 'uenvs': [], 'applied': False})
+    return results
+
+def finish_host(config, uenvs, applied):
+    """
+    Steps shared by all the profiles after their setup: uenv images, and custom commands if something was applied.
+
+    :return: (status, list of messages)
+    """
+    if uenvs and not manage_uenv_images(uenvs):
+        return 'error', ["❌ uenvs not set up correctly ask for help"]
+    if not applied:
+        return 'ok', ["✅ Nothing to apply"]
+    if not execute_custom_commands(config):
+        return 'error', ["❌ custom commands not set up correctly ask for help"]
+    return 'ok', ["✅ Done"]
+
+def widget_value(text):
+    key, sep, value = text.partition('=')
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got '{text}'")
+    return key, value
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grant", required=True, help="grant to configure (value of the 'grant' widget)")
+    parser.add_argument("--set", type=widget_value, action="append", default=[], metavar="KEY=VALUE",
+                        help="value of another widget of config.yml, can be repeated")
+    parser.add_argument("--config", default=str(configuration_file), help="path of config.yml")
+    parser.add_argument("--apply", action="store_true", help="apply the updates instead of only reporting them")
+    parser.add_argument("--full", action="store_true", help="recompare everything, ignoring the verdicts of the last inspection")
+    parser.add_argument("--lazy", action="store_true", help="only compare the computers of the selected grant")
+    profiles = parser.add_mutually_exclusive_group()
+    profiles.add_argument("--profile", dest="profiles", action="append", help="AiiDA profile, can be repeated (default: the default profile)")
+    profiles.add_argument("--all-profiles", action="store_true", help="run on every AiiDA profile")
+    parser.add_argument("--workers", type=int, default=FLEET_MAX_WORKERS, help="profiles handled in parallel")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    widget_values = dict(args.set)
+    widget_values['grant'] = args.grant
+    report = {'mode': 'apply' if args.apply else 'inspect', 'widgets': widget_values, 'commit': None,
+              'status': 'error', 'messages': [], 'profiles': {}, 'ssh_handshakes_saved': 0}
+
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            report['status'] = run(args, widget_values, report)
+        finally:
+            # tear down the multiplexed ssh masters, as the app does after applying
+            report['ssh_handshakes_saved'] = close_ssh_sessions(verbose=True)
+
+    print(json.dumps(report, indent=2, default=str))
+    return STATUS_EXIT_CODES[report['status']]
+
+def run(args, widget_values, report):
+    """
+    Runs the host steps and the profiles, filling the messages and per-profile results of report.
+
+    :return: the overall status.
+    """
+    status, messages, config = prepare_host(widget_values, args.config, apply=args.apply)
+    report['messages'] += messages
+    report['commit'] = get_local_commit()
+    if status in ('error', 'usage'):
+        return status
+    if args.all_profiles:
+        profiles = list(get_aiida_config().profile_names)
+    else:
+        profiles = args.profiles or [None]
+    results = run_fleet(profiles, config, widget_values.get('grant', ''), apply=args.apply,
+                        force=args.full, lazy=args.lazy, max_workers=args.workers)
+    for result in results:
+        report['profiles'][result['profile']] = result
+        status = worst_status(status, result['status'])
+    if args.apply and status == 'ok':
+        uenvs = sorted({tuple(uenv) for result in results for uenv in result['uenvs']})
+        status, messages = finish_host(config, uenvs, applied=any(result['applied'] for result in results))
+        report['messages'] += messages
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
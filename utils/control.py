@@ -1,120 +1,243 @@
 import os
-from copy import deepcopy
-from itertools import product
-import ipywidgets as ipw
-from IPython.display import display
-import time
-from .string_utils import *
-from .repo_utils import *
-from .aiida_and_ssh_utils import *
-from datetime import datetime,timedelta
+import re
+import yaml
+from pathlib import Path
+from .string_utils import Template, compile_template, compile_tree, render_tree, resolve_variables, extract_first_column, fingerprint
+from .repo_utils import (
+    GIT_REPO_PATH, REPO_FETCH_INTERVAL, GIT_NETWORK_TIMEOUT, config_path, configuration_file,
+    clone_repository, fetch_remote, get_latest_remote_commit, get_local_commit, pull_latest_changes,
+)
+from .ssh_utils import run_command, check_ssh_config
+from .aiida_and_ssh_utils import (
+    get_profile, aiida_inventory, compare_computer_configuration, compare_computers_configuration,
+    compare_codes_configuration, setup_aiida_computer, setup_aiida_code,
+)
+from .cache_utils import (
+    CONFIG_CACHE_FILE, UENV_CATALOG_KINDS, UENV_CATALOG_TTL, load_pickle_cache, save_pickle_cache,
+    load_inspection_cache, save_inspection_cache, get_cached_uenv_catalog, store_uenv_catalog,
+    invalidate_uenv_catalog, uenv_cache_stats,
+)
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 
 # Check repository of config files
-def check_repository():
-    """Check if the repository exists and pull the latest changes."""
+def check_repository(interval=REPO_FETCH_INTERVAL, timeout=GIT_NETWORK_TIMEOUT):
+    """
+    Check if the repository exists and update it to the latest remote commit.
+    The remote is fetched at most once per interval; if it cannot be reached the last known commit is used.
+    """
     msg = "<b style='color:green;'>✅ Repository is up to date.</b>"
     # Ensure the repository exists
     if not os.path.exists(GIT_REPO_PATH):
-        msg = "<b style='color:orange;'>⚠️ Repository updated. Please inspect and then apply changes.</b>"
         if not clone_repository():
             return False,"<b style='color:red;'>❌ Failed to clone the repository. Please check your configuration.</b>"
-    
+        return True,"<b style='color:orange;'>⚠️ Repository updated. Please inspect and then apply changes.</b>"
+
+    fetched = fetch_remote(interval=interval, timeout=timeout)
     local_commit = get_local_commit()
     remote_commit = get_latest_remote_commit()
-    
-    if not local_commit or not remote_commit:
+
+    if not local_commit:
         return False,"<b style='color:red;'>❌ Unable to check for updates.</b>"
+    if fetched is False:
+        msg = f"<b style='color:orange;'>⚠️ Repository not reachable, using the last known commit {local_commit[:7]}.</b>"
 
-    if local_commit != remote_commit:
+    if remote_commit and local_commit != remote_commit:
         if not pull_latest_changes():
             return False,"<b style='color:red;'>❌ Failed to update the repository.</b>"
         else:
             msg = "<b style='color:orange;'>⚠️ Repository updated. Please apply changes.</b>"
     return True,msg  
 
-def get_config(file_path='/home/jovyan/opt/aiidalab-alps-files/config.yml', config_widgets={}):
-    """Get the configuration from the YAML file."""
+# libyaml parser when available, much faster than the pure-Python one
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+CONFIG_SECTIONS = {'widgets': dict, 'variables': dict, 'computers': dict, 'codes': dict}
+
+_parsed_config = {}  # (commit, mtime) of config.yml -> (data, errors)
+_compiled_config = {}  # last parsed config.yml and its compiled tree
+
+def validate_config(data):
+    """
+    Checks the structure of config.yml.
+
+    :return: list of error messages, empty if the configuration is valid.
+    """
+    if not isinstance(data, dict):
+        return ["config.yml is not a dictionary"]
+    errors = [
+        f"section '{section}' must be a {kind.__name__}"
+        for section, kind in CONFIG_SECTIONS.items() if section in data and not isinstance(data[section], kind)
+    ]
+    if errors:
+        return errors
+    for name, computer in data.get('computers', {}).items():
+        if not isinstance(computer, dict):
+            errors.append(f"computer '{name}' must be a dict")
+            continue
+        for key in ('setup', 'config', 'grants'):
+            if key not in computer:
+                errors.append(f"computer '{name}' has no '{key}'")
+    for name, code in data.get('codes', {}).items():
+        if not isinstance(code, dict):
+            errors.append(f"code '{name}' must be a dict")
+        elif code.get('computer') not in data.get('computers', {}):
+            errors.append(f"code '{name}' refers to the undefined computer '{code.get('computer')}'")
+    return errors
+
+def load_config_file(file_path=configuration_file):
+    """
+    Parses and validates config.yml once per repository commit (and file mtime).
+    The result is kept in memory and on disk, so that the widgets and the inspection share it across sessions.
+
+    :return: (data, errors) with errors the list returned by validate_config.
+    """
+    key = (get_local_commit(), os.path.getmtime(file_path), str(file_path))
+    if key in _parsed_config:
+        return _parsed_config[key]
+    cached = load_pickle_cache(CONFIG_CACHE_FILE)
+    if cached is not None and cached[0] == key:
+        parsed = cached[1]
+    else:
+        with open(file_path, 'r') as f:
+            data = yaml.load(f, Loader=YAML_LOADER)
+        parsed = (data, validate_config(data))
+        save_pickle_cache(CONFIG_CACHE_FILE, (key, parsed))
+    _parsed_config.clear()
+    _parsed_config[key] = parsed
+    return parsed
+
+def compile_config(data):
+    """Compiles the templates of a parsed config.yml, once per parsed tree (i.e. per commit)."""
+    if _compiled_config.get('data') is not data:
+        _compiled_config.update(data=data, compiled=compile_tree(data))
+    return _compiled_config['compiled']
+
+def get_config(file_path='/home/jovyan/opt/aiidalab-alps-files/config.yml', config_widgets={}, check_repo=True):
+    """
+    Get the configuration from the YAML file.
+
+    :param config_widgets: dict key -> widget of config.yml, or directly its value (headless use).
+    :param check_repo: update the repository first, False if it was already checked by the caller.
+    """
+    widget_values = {key: getattr(widget, 'value', widget) for key, widget in config_widgets.items()}
     # Verifica che tutti i widget siano selezionati
-    for key in config_widgets:
-        if config_widgets[key].value == "select":
+    for key in widget_values:
+        if widget_values[key] == "select":
             return False,f"<b style='color:red;'>❌please select {key}</b>", {}
 
     # Verifica lo stato del repository
-    status_ok, msg = check_repository()
-    if not status_ok:
-        return status_ok,msg, {}
-
-    # Carica lo YAML
-    with open(file_path, 'r') as f:
-        data = yaml.safe_load(f)
-
-    variables = data.get("variables", {})
-    if 'timestamp' in variables and variables['timestamp'] == 'now':
-        variables['timestamp'] = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
-    widgets = data.get("widgets", {})
-
-    # Funzione per sostituire {key} in una stringa
-    def replace_in_string(s, replacements):
-        for key, value in replacements.items():
-            s = s.replace(f"{{{key}}}", value)
-        return s
-
-    # Sostituzione ricorsiva in dizionari, liste e stringhe
-    def recursive_replace(obj, replacements):
-        if isinstance(obj, dict):
-            return {k: recursive_replace(v, replacements) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [recursive_replace(item, replacements) for item in obj]
-        elif isinstance(obj, str):
-            return replace_in_string(obj, replacements)
-        else:
-            return obj
+    if check_repo:
+        status_ok, msg = check_repository()
+        if not status_ok:
+            return status_ok,msg, {}
+
+    # Carica lo YAML, compilato una sola volta per commit
+    parsed, errors = load_config_file(file_path)
+    if errors:
+        return False,f"<b style='color:red;'>❌ Invalid config.yml: {'; '.join(errors)}</b>", {}
+    compiled = compile_config(parsed)
+
+    variables = dict(compiled.get("variables", {}))
+    if variables.get('timestamp') == compile_template('now'):
+        variables['timestamp'] = compile_template(datetime.now().strftime("%Y-%m-%d-%H-%M-%S"))
+    widgets = compiled.get("widgets", {})
 
     # Prima passata: ottieni i valori dei widget
     widget_replacements = {
-        key: config_widgets[key].value
-        for key in widgets if key in config_widgets
+        key: widget_values[key]
+        for key in widgets if key in widget_values
     }
 
-    # Sostituisci {widget} dentro alle variabili
-    for key, value in variables.items():
-        if isinstance(value, str):
-            variables[key] = replace_in_string(value, widget_replacements)
-
-    # Crea un dizionario con tutte le sostituzioni da applicare allo YAML intero
-    all_replacements = {}
-    all_replacements.update(widget_replacements)
-    all_replacements.update({
-        key: value for key, value in variables.items()
-        if isinstance(value, str)
-    })
-
-    # Applica tutte le sostituzioni allo YAML
-    data = recursive_replace(data, all_replacements)
-
-    return True,'', data
-
-
+    # Risolvi le variabili (widget e altre variabili) in ordine di dipendenza
+    unresolved = set()
+    variable_templates = {key: value for key, value in variables.items() if isinstance(value, Template)}
+    resolved_variables = resolve_variables(variable_templates, widget_replacements, unresolved)
+
+    # Applica tutte le sostituzioni allo YAML in una sola passata
+    all_replacements = {**widget_replacements, **resolved_variables}
+    if 'variables' in compiled:
+        compiled = {**compiled, 'variables': variables}
+    data = render_tree(compiled, all_replacements, unresolved)
+    if 'variables' in data:
+        data['variables'].update(resolved_variables)
+
+    msg = ''
+    if unresolved:
+        msg = f"<b style='color:orange;'>⚠️ Unresolved placeholders in config.yml: {', '.join(sorted(unresolved))}</b><br>"
+    return True,msg, data
+
+def check_for_updates(config,selected_grant,force=False,lazy=False):
+    """
+    Checks teh config file.
 
-def check_for_updates(config,selected_grant):
-    """Checks teh config file."""    
-    status,msg,updates_needed = process_aiida_configuration(config, config_path,selected_grant)
+    :return: (msg, updates_needed, deferred) where deferred lists the computers whose comparison was skipped in lazy mode.
+    """    
+    status,msg,updates_needed,deferred = process_aiida_configuration(config, config_path,selected_grant,force=force,lazy=lazy)
     if not status:
-        return msg,{}
+        return msg,{},[]
     if not updates_needed:
-        return "<b style='color:green;'>✅ Your configuration is up to date.</b>",{}
+        return "<b style='color:green;'>✅ Your configuration is up to date.</b>",{},deferred
     else:
-        return msg,updates_needed
+        return msg,updates_needed,deferred
+
+def computer_details(config, computer_label, inventory=None):
+    """
+    Full comparison of an installed computer, and of its codes, against the configuration.
+    Used on demand for the computers deferred by a lazy inspection.
+
+    :param inventory: AiidaInventory snapshot of the profile, collected if None and needed.
+    :return: (HTML formatted message, updates to merge in updates_needed: hide and rename the computer
+             and its codes if it is outdated, as a full inspection would plan)
+    """
+    defined_computers = config.get("computers", {})
+    comp_key = next((comp for comp, comp_data in defined_computers.items() if comp_data['setup']['label'] == computer_label), None)
+    if comp_key is None:
+        return f"❌ Computer '{computer_label}' not found in config.yml!<br>", {}
+    is_up_to_date, result_msg = compare_computer_configuration(computer_label, defined_computers[comp_key])
+    defined_codes = {code_key: code_data for code_key, code_data in config.get("codes", {}).items() if code_data['computer'] == comp_key}
+    codes_to_compare = {f"{code_data['label']}@{computer_label}": code_data for code_data in defined_codes.values()}
+    for code_label, (_, msg) in compare_codes_configuration(codes_to_compare).items():
+        result_msg += msg
+    if is_up_to_date:
+        return result_msg, {}
+
+    if inventory is None:
+        status_inventory, msg, inventory = aiida_inventory()
+        if not status_inventory:
+            return result_msg + msg, {}
+    updates = {'computers': {computer_label: {'hide':True,'rename': True,'install':False}}}
+    for code_key, code_data in defined_codes.items():
+        code_label = f"{code_data['label']}@{computer_label}"
+        code_pk_active = inventory.active_code_pks.get(code_label)
+        code_pk_not_active = inventory.not_active_code_pks.get(code_label)
+        if code_pk_active is not None:
+            updates.setdefault('codes', {})[code_label] = {'code_key': code_key,'rename': code_pk_active,'hide':True,'install':False}
+        elif code_pk_not_active is not None:
+            updates.setdefault('codes', {})[code_label] = {'code_key': code_key,'rename': code_pk_not_active,'hide':False,'install':False}
+    result_msg += f"⚠️ Computer '{computer_label}' and its codes will be hidden and renamed when applying the updates.<br>"
+    return result_msg, updates
     
-def process_aiida_configuration(config, config_path,selected_grant):
+def _cached_verdict(records, label, entry_fingerprint, state):
+    """Returns the verdict recorded for label if neither the config entry nor the AiiDA object changed, None otherwise."""
+    record = records.get(label)
+    if record and state is not None and record['fingerprint'] == entry_fingerprint and record['state'] == state:
+        return tuple(record['verdict'])
+    return None
+
+def process_aiida_configuration(config, config_path,selected_grant,inventory=None,force=False,lazy=False):
     """
     Reads the YAML configuration file, renames the existing SSH config, 
     creates a new SSH config from the YAML file, and checks installed vs. missing AiiDA computers.
     
     :param configuration_file: Path to the YAML configuration file.
     :param config_path: Path to the SSH config directory.
-    :return: Formatted string with the results.
+    :param inventory: AiidaInventory snapshot of the profile, collected if None.
+    :param force: Recompare everything instead of reusing the verdicts of the last inspection.
+    :param lazy: Only compare the computers of the selected grant. The computers of the other grants are only classified
+                 (installed, active, stored fingerprint, cached verdict); the ones without a verdict are deferred:
+                 their diff and hide/rename plan come from computer_details or from a full (non lazy) inspection.
+    :return: (status, formatted string with the results, updates_needed, computers whose comparison was deferred)
     """
     updates_needed={}
     # Convert to Path objects
@@ -131,24 +254,31 @@ def process_aiida_configuration(config, config_path,selected_grant):
             updates_needed.setdefault('ssh_config', {})['rename'] =  False
         updates_needed['ssh_config']['hosts'] = config_hosts
         
-    # Get the list of active and not-active AiiDA computers
-    status_computers,msg,active_computers,not_active_computers = aiida_computers()
-    result_msg +=msg
-    # Get the list of active and not-active AiiDA codes
-    status_codes,msg,active_codes,not_active_codes = aiida_codes()
-    result_msg +=msg
-    if not (status_computers and status_codes):
-        return False,result_msg + msg
+    # Get the active and not-active AiiDA computers and codes
+    if inventory is None:
+        status_inventory,msg,inventory = aiida_inventory()
+        result_msg +=msg
+        if not status_inventory:
+            return False,result_msg,{},[]
+    active_computers = inventory.active_computers
+    not_active_computers = inventory.not_active_computers
+
+    # Verdicts of the last inspection are reused for unchanged config entries and AiiDA objects
+    profile = get_profile().name
+    previous = {'computers': {}, 'codes': {}} if force else load_inspection_cache(profile)
+    verdicts = {'commit': get_local_commit(), 'computers': {}, 'codes': {}}
+    reused = 0
+    deferred = []
                            
         
     # Check if each defined computer exists in AiiDA and is up-to-date
     defined_computers = config.get("computers", {})
     # Build valid combinations
-    valid_computer_grants =  [f"{name}_{grant}" for name, data in defined_computers.items() for grant in data['grants']]
-    selected_computer_grant = [f"{name}_{grant}" for name, data in defined_computers.items() for grant in data['grants'] if grant == selected_grant]
+    valid_computer_grants =  {f"{name}_{grant}" for name, data in defined_computers.items() for grant in data['grants']}
+    selected_computer_grant = {f"{name}_{grant}" for name, data in defined_computers.items() for grant in data['grants'] if grant == selected_grant}
 
     # Add special standalone entries
-    valid_computer_grants += ["localhost"]
+    valid_computer_grants.add("localhost")
     # Checking for old grants
     
     defined_grants = config['widgets']['grant']
@@ -158,13 +288,46 @@ def process_aiida_configuration(config, config_path,selected_grant):
             result_msg += f"⚠️ Computer '{computer}' is installed in AiiDA but  is not foreseen in the configuration file.<br>"
             updates_needed.setdefault('computers', {})[computer] = {'hide':True,'rename': False,'install':False}
 
+    # Compare the installed computers without a cached or fingerprint verdict
+    computers_to_compare = {}
+    computer_comparisons = {}
+    for comp_data in defined_computers.values():
+        full_comp = comp_data['setup']['label']
+        if full_comp not in active_computers:
+            continue
+        entry_fingerprint, state = fingerprint(comp_data), inventory.computer_states.get(full_comp)
+        verdict = _cached_verdict(previous['computers'], full_comp, entry_fingerprint, state)
+        if verdict is None and inventory.computer_fingerprints.get(full_comp) == entry_fingerprint:
+            # set up from this very definition: no need for a field by field comparison
+            computer_comparisons[full_comp] = True, "✅ No differences found! The stored configuration matches AiiDA.<br>"
+        elif verdict is not None:
+            computer_comparisons[full_comp] = verdict
+            reused += 1
+        elif lazy and full_comp not in selected_computer_grant:
+            # not compared: its diff and the hide/rename plan are computed on demand (computer_details)
+            # or by a full re-inspection
+            deferred.append(full_comp)
+            if full_comp in previous['computers']:
+                verdicts['computers'][full_comp] = previous['computers'][full_comp]
+            continue
+        else:
+            computers_to_compare[full_comp] = comp_data
+        if state is not None:
+            verdicts['computers'][full_comp] = {'fingerprint': entry_fingerprint, 'state': state}
+    computer_comparisons.update(compare_computers_configuration(computers_to_compare))
+    for full_comp in verdicts['computers']:
+        if full_comp in computer_comparisons:
+            verdicts['computers'][full_comp]['verdict'] = list(computer_comparisons[full_comp])
+
     # Checking computers
     for comp, comp_data in defined_computers.items():
         # full_comp = daint_lp83 since in the yml is daint_{grant}
         full_comp = comp_data['setup']['label']
-        if full_comp in active_computers:
+        if full_comp in deferred:
+            result_msg += f"⬜ Computer '{full_comp}' is installed in AiiDA, grant not selected: not compared, details on demand.<br>"
+        elif full_comp in active_computers:
             result_msg += f"✅⬜ Computer '{full_comp}' is already installed in AiiDA, checking for its configuration.<br>"
-            is_up_to_date, msg = compare_computer_configuration(full_comp, comp_data)
+            is_up_to_date, msg = computer_comparisons[full_comp]
             result_msg += msg
             if not is_up_to_date:  # Only add to updates_needed if not up-to-date
                 install = full_comp in selected_computer_grant
@@ -190,13 +353,41 @@ def process_aiida_configuration(config, config_path,selected_grant):
     # Hide unclassified codes
 
     # hide and rename codes of old computers
-    for codename, codecomputer, code_pk in active_codes:
+    for codename, codecomputer, code_pk in inventory.active_codes:
         code_label = f"{codename}@{codecomputer}"
         if codecomputer not in valid_computer_grants:
             result_msg += f"⚠️ Code '{codename}' is installed in AiiDA but its computer/grant is not defined in the configuration file.<br>"
             updates_needed.setdefault('codes', {})[code_label] = {'hide':code_pk,'rename':code_pk,'install':False}
     
     
+    # Compare in one pass all the codes that could be installed on the selected grant
+    codes_to_compare = {}
+    code_comparisons = {}
+    for code_data in defined_codes.values():
+        computer = defined_computers[code_data['computer']]['setup']['label']
+        if computer in selected_computer_grant:
+            code_label = f"{code_data['label']}@{computer}"
+            entry_fingerprint = fingerprint(code_data)
+            code_pk = inventory.active_code_pks.get(code_label)
+            state = inventory.code_mtimes.get(code_pk)
+            verdict = _cached_verdict(previous['codes'], code_label, entry_fingerprint, state)
+            if verdict is None and code_pk is not None and inventory.code_fingerprints.get(code_pk) == entry_fingerprint:
+                # set up from this very definition: no need for a field by field comparison
+                code_comparisons[code_label] = True, f"✅ No differences found! The stored configuration for {code_label} matches AiiDA.<br>"
+            elif verdict is None:
+                codes_to_compare[code_label] = code_data
+            else:
+                code_comparisons[code_label] = verdict
+                reused += 1
+            if state is not None:
+                verdicts['codes'][code_label] = {'fingerprint': entry_fingerprint, 'state': state}
+    code_comparisons.update(compare_codes_configuration(codes_to_compare))
+    for code_label in verdicts['codes']:
+        verdicts['codes'][code_label]['verdict'] = list(code_comparisons[code_label])
+    save_inspection_cache(profile, verdicts)
+    if reused:
+        result_msg += f"✅ Reused {reused} verdicts of the last inspection.<br>"
+
     for code_key, code_data in defined_codes.items(): 
         computer = defined_computers[code_data['computer']]['setup']['label']
         install = computer in selected_computer_grant
@@ -204,8 +395,8 @@ def process_aiida_configuration(config, config_path,selected_grant):
         computer_will_be_installed = computer in updates_needed.get('computers', {}) and  updates_needed['computers'][computer].get('install',False)
         computer_up_to_date = computer in active_computers and not computer_will_be_installed
         code_label = f"{code_data['label']}@{computer}"
-        code_pk_active = next((pk for codename,codecomputer, pk in active_codes if f"{codename}@{codecomputer}" == code_label), None)
-        code_pk_not_active = next((pk for codename,codecomputer, pk in not_active_codes if f"{codename}@{codecomputer}" == code_label), None)
+        code_pk_active = inventory.active_code_pks.get(code_label)
+        code_pk_not_active = inventory.not_active_code_pks.get(code_label)
 
         # Default: No update needed but check for uenv
     
@@ -226,7 +417,7 @@ def process_aiida_configuration(config, config_path,selected_grant):
         elif computer_up_to_date: # Computer is present and up-to-date
             if install:
                 if code_pk_active is not None: # the code is already present and active
-                    codes_equal,msg = compare_code_configuration(code_label,code_data)
+                    codes_equal,msg = code_comparisons[code_label]
                     if not codes_equal: # but outdated
                         updates_needed.setdefault('codes', {})[code_label] = {'code_key': code_key,'rename': code_pk_active,'install':True}
                         msg = f"⬜ Code {code_label} will be installed  {computer} is present.<br>"
@@ -245,9 +436,9 @@ def process_aiida_configuration(config, config_path,selected_grant):
     # To do: Check if cusntom app installations are needed
         
 
-    return True,result_msg,updates_needed
+    return True,result_msg,updates_needed,deferred
 
-def setup_computers(computers_to_setup,defined_computers):
+def setup_computers(computers_to_setup,defined_computers,profile=None):
     status = True
     for computer in computers_to_setup:
         print("CHECKING COMPUTER",computer)
@@ -258,10 +449,11 @@ def setup_computers(computers_to_setup,defined_computers):
         status = setup_aiida_computer(computer, config_computers,hide=computers_to_setup[computer].get('hide',False),
                              torelabel=computers_to_setup[computer].get('rename',False),
                              install=computers_to_setup[computer].get('install',False),
-                             grant=grant
+                             grant=grant,
+                             profile=profile
                              )
     return status
-def setup_codes(codes_to_setup,config):
+def setup_codes(codes_to_setup,config,profile=None):
     defined_codes = config.get("codes", {})
     uenvs=[]
     status = True
@@ -291,91 +483,152 @@ def setup_codes(codes_to_setup,config):
             
         status = setup_aiida_code(full_code, code_data,hide=hide,
                             pktorelabel=pktorelabel,
-                            install=install)
+                            install=install,
+                            profile=profile)
         
             
 
     return status,uenvs
 
 # Manage uenvs
-
-def manage_uenv_images(uenvs):
-    """
-    Ensure that required uenv images are available on a remote host.
-    
-    :param remote_host: The remote machine where commands will be executed.
-    :param uenvs: A list of required uenv images (e.g., ['cp2k/2024.3:v2', 'qe/7.4:v2'])
-    """
-
-    # Step 1: Check if the uenv repo exists, if not, create it
-    hosts = {uenv[0] for uenv in uenvs}
-    for remotehost in hosts:
-        print(f"🔍 Checking UENV repository status on {remotehost}")
-        command = ["ssh", remotehost, "uenv", "repo", "status"]
-        repo_status, command_ok = run_command(command)
+UENV_MAX_PARALLEL_PULLS = 2  # concurrent `uenv image pull` per host
+
+def _ensure_uenv_repo(remotehost, log):
+    """Check if the uenv repo exists on remotehost, if not, create it."""
+    log.append(f"🔍 Checking UENV repository status on {remotehost}")
+    repo_status, command_ok = run_command(["ssh", remotehost, "uenv", "repo", "status"])
+    if not command_ok:
+        log.append(f"❌ Failed to check UENV repo status on {remotehost}. Exiting.")
+        return False
+
+    if "not found" in repo_status.lower() or not repo_status or "no repository" in repo_status.lower() :
+        log.append(f"⚠️ UENV repo not found on {remotehost}. Creating repository...")
+        command_out, command_ok = run_command(["ssh", remotehost, "uenv", "repo", "create"])
         if not command_ok:
-            print(f"❌ Failed to check UENV repo status on {remotehost}. Exiting.")
+            log.append(f"❌ Failed to create UENV repo on {remotehost}. Exiting.")
             return False
-        
-        if "not found" in repo_status.lower() or not repo_status or "no repository" in repo_status.lower() :
-            print(f"⚠️ UENV repo not found. Creating repository...")
-            command = ["ssh", remotehost, "uenv", "repo", "create"]
-            command_out, command_ok = run_command(command)
-            if not command_ok:
-                print(f"❌ Failed to create UENV repo on {remotehost}. Exiting.")
-                return False
-        else:
-            print(f"✅ UENV repo is available on {remotehost}.")
+    else:
+        log.append(f"✅ UENV repo is available on {remotehost}.")
+    return True
+
+def _fetch_uenv_images(remotehost, log, catalog_ttl=UENV_CATALOG_TTL):
+    """
+    Get the images available to the user, system-wide and on service:: on remotehost.
+    The system-wide and service:: catalogs are taken from the on-disk cache when younger than catalog_ttl,
+    the remaining listings are independent and run in parallel.
 
-    # Step 2: Get the list of images available to the user
+    :param catalog_ttl: Maximum age in seconds of the cached catalogs, 0 to always fetch them.
+    :return: (dict with keys 'user', 'host', 'service' or None on failure, set of kinds taken from the cache)
+    """
+    listings = {
+        'user': (["ssh", remotehost, "uenv", "image", "ls"], f"❌ Failed to fetch UENV images on {remotehost}. Exiting."),
+        'host': (["ssh", remotehost, "uenv", "image", "find"], f"❌ Failed to fetch system-wide UENV images on {remotehost}. Exiting."),
+        'service': (["ssh", remotehost, "uenv", "image", "find", "service::"], f"❌ Failed to fetch service UENV images on {remotehost}. Exiting."),
+    }
     available_images = {}
-    for remotehost in hosts:
-        print(f"🔍 Fetching available UENV images on {remotehost} for the user ")
-        command = ["ssh", remotehost, "uenv", "image", "ls"]
-        command_out, command_ok = run_command(command)
-        #print(extract_first_column(command_out))
+    if catalog_ttl:
+        for kind in UENV_CATALOG_KINDS:
+            images = get_cached_uenv_catalog(remotehost, kind, ttl=catalog_ttl)
+            if images is not None:
+                available_images[kind] = images
+    cached = set(available_images)
+    to_fetch = [kind for kind in listings if kind not in cached]
+    log.append(f"🔍 Fetching available UENV images on {remotehost} ({', '.join(to_fetch)})")
+    with ThreadPoolExecutor(max_workers=len(to_fetch)) as pool:
+        futures = {kind: pool.submit(run_command, listings[kind][0]) for kind in to_fetch}
+    for kind, future in futures.items():
+        command_out, command_ok = future.result()
         if not command_ok:
-            print(f"❌ Failed to fetch UENV images on {remotehost}. Exiting.")
-            return False
-        available_images.setdefault(remotehost,{})['user'] = extract_first_column(command_out)
+            log.append(listings[kind][1])
+            return None, cached
+        available_images[kind] = extract_first_column(command_out)
+        if kind in UENV_CATALOG_KINDS:
+            store_uenv_catalog(remotehost, kind, available_images[kind])
+    return available_images, cached
+
+def _pull_uenv_image(remotehost, env, available_images):
+    """Pull a single image from the host or service:: repository. Returns (ok, messages)."""
+    if env in available_images['user']:
+        return True, [f"✅ Image '{env}' is already available for the user on {remotehost}."]
+    if env in available_images['host']:
+        msg = f"✅ Image '{env}' is available on the host {remotehost}. Pulling..."
+        source = env
+    elif env in available_images['service']:
+        msg = f"✅ Image '{env}' is available in the service repo on {remotehost}. Pulling from service::..."
+        source = f"service::{env}"
+    else:
+        return False, [f"❌ Image '{env}' is not available anywhere on {remotehost}! Manual intervention needed."]
+    command_out, command_ok = run_command(["ssh", remotehost, "uenv", "image", "pull", source])
+    if not command_ok:
+        return False, [msg, f"❌ Failed to pull '{source}' on {remotehost}: {command_out}"]
+    return True, [msg]
 
-        # Step 3: Get the list of all images available on the system
-        print("🔍 Fetching available UENV images (system-wide)")
-        
-        command = ["ssh", remotehost, "uenv", "image", "find"]
-        command_out, command_ok = run_command(command)
-        #print(extract_first_column(command_out))
-        if not command_ok:
-            print("❌ Failed to fetch system-wide UENV images. Exiting.")
-            return False
-        available_images.setdefault(remotehost,{})['host'] = extract_first_column(command_out)
-        # Get the list of all images available on service:: (if any)
-        print("🔍 Fetching available UENV images on service::")        
-        command = ["ssh", remotehost, "uenv", "image", "find", "service::"]
-        command_out,command_ok = run_command(command)
-        #print(extract_first_column(command_out))
-        if not command_ok:
-            print("❌ Failed to fetch service UENV images. Exiting.")
-            return False    
-        available_images.setdefault(remotehost,{})['service'] = extract_first_column(command_out)
-
-    # Step 4: Check missing images and pull them if necessary
-    for uenv in uenvs:
-        env = uenv[1]
-        remotehost = uenv[0]
-        if env in available_images[remotehost]['user']:
-            print(f"✅ Image '{env}' is already available for the user on {remotehost}.")
-        elif env in available_images[remotehost]['host']:
-            print(f"✅ Image '{env}' is available on the host {remotehost}. Pulling...")
-            command = ["ssh", remotehost, "uenv", "image", "pull", env]
-            command_out, command_ok = run_command(command)
-        elif env in available_images[remotehost]['service']:
-            print(f"✅ Image '{env}' is available in the service repo on {remotehost}. Pulling from service::...")
-            command = ["ssh", remotehost, "uenv", "image", "pull", f"service::{env}"]
-            command_out, command_ok = run_command(command)
-        else:
-            print(f"❌ Image '{env}' is not available anywhere on {remotehost}! Manual intervention needed.")
-            return False
+def _manage_host_uenv_images(remotehost, envs, max_parallel_pulls, catalog_ttl=UENV_CATALOG_TTL):
+    """
+    Ensure that the uenv images envs are available on a single remote host.
 
-    print("✅ UENV management complete.")
+    :return: (ok, log) where log is the list of messages produced for the host.
+    """
+    log = []
+    if not _ensure_uenv_repo(remotehost, log):
+        return False, log
+    available_images, cached = _fetch_uenv_images(remotehost, log, catalog_ttl=catalog_ttl)
+    if available_images is None:
+        return False, log
+    known_images = set().union(*available_images.values())
+    if cached and any(env not in known_images for env in envs):
+        # the cached catalogs may be stale: refresh them before giving up on an image
+        log.append(f"🔄 Refreshing cached UENV catalogs of {remotehost}")
+        invalidate_uenv_catalog(remotehost)
+        available_images, _ = _fetch_uenv_images(remotehost, log, catalog_ttl=0)
+        if available_images is None:
+            return False, log
+
+    # Check missing images and pull them with a bounded concurrency
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel_pulls)) as pool:
+        results = list(pool.map(lambda env: _pull_uenv_image(remotehost, env, available_images), envs))
+    ok = True
+    for pulled, messages in results:
+        log.extend(messages)
+        ok = ok and pulled
+    if any(env not in available_images['user'] for env in envs):
+        # images were pulled: the catalogs are refetched next time
+        invalidate_uenv_catalog(remotehost)
+    return ok, log
+
+def manage_uenv_images(uenvs, max_parallel_pulls=UENV_MAX_PARALLEL_PULLS, catalog_ttl=UENV_CATALOG_TTL):
+    """
+    Ensure that required uenv images are available on the remote hosts.
+    All hosts are handled concurrently, the messages are printed per host once it is done.
+
+    :param uenvs: A list of (remote_host, image) tuples (e.g., [('daint.alps.cscs.ch', 'qe/7.4:v2')])
+    :param max_parallel_pulls: Maximum number of images pulled at the same time on a host.
+    :param catalog_ttl: Maximum age in seconds of the cached uenv catalogs, 0 to always fetch them.
+    """
+    envs_per_host = {}
+    for remotehost, env in uenvs:
+        envs_per_host.setdefault(remotehost, [])
+        if env not in envs_per_host[remotehost]:
+            envs_per_host[remotehost].append(env)
+    if not envs_per_host:
+        print("✅ UENV management complete.")
+        return True
+
+    with ThreadPoolExecutor(max_workers=len(envs_per_host)) as pool:
+        futures = {
+            remotehost: pool.submit(_manage_host_uenv_images, remotehost, envs, max_parallel_pulls, catalog_ttl)
+            for remotehost, envs in envs_per_host.items()
+        }
+    # print from the calling thread so that the output ends up in the right widget
+    all_ok = True
+    for remotehost, future in futures.items():
+        ok, log = future.result()
+        for line in log:
+            print(line)
+        all_ok = all_ok and ok
+    if not all_ok:
+        return False
+
+    stats = uenv_cache_stats()
+    print(f"✅ UENV management complete (catalog cache: {stats['hits']} hits, {stats['misses']} misses).")
     return True
@@ -0,0 +1,62 @@
+"""
+Import-time regression check of the headless helpers.
+
+    python -m utils.import_budget [--budget-ms 150]
+
+Imports the UI-free modules in a fresh interpreter with ``python -X importtime`` and fails
+if they pull in AiiDA or the widget stack, or if importing them takes longer than the budget.
+Run by tests/test_import_budget.py with the rest of the test suite.
+"""
+import argparse
+import subprocess
+import sys
+
+# modules that must stay importable without AiiDA, ipywidgets or IPython
+HEADLESS_MODULES = ["utils.string_utils", "utils.repo_utils", "utils.cache_utils", "utils.ssh_utils", "utils.process_utils"]
+FORBIDDEN_MODULES = ("aiida", "ipywidgets", "IPython", "kiwipy", "plumpy")
+IMPORT_BUDGET_MS = 150
+
+def measure_imports(modules=HEADLESS_MODULES):
+    """
+    Imports the modules in a fresh interpreter.
+
+    :return: dict module -> (self time, cumulative time) in microseconds, in import order.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+def check_import_budget(modules=HEADLESS_MODULES, budget_ms=IMPORT_BUDGET_MS):
+    """
+    :return: (True if the budget is respected, message)
+    """
+    timings = measure_imports(modules)
+    forbidden = sorted(name for name in timings if name.split(".")[0] in FORBIDDEN_MODULES)
+    # self times of every imported module, the cumulative ones overlap
+    total_ms = sum(self_us for self_us, _ in timings.values()) / 1000
+    if forbidden:
+        return False, f"❌ Headless modules import {', '.join(forbidden)}"
+    if total_ms > budget_ms:
+        return False, f"❌ Importing the headless modules took {total_ms:.1f} ms (budget {budget_ms} ms)"
+    return True, f"✅ Headless modules imported in {total_ms:.1f} ms (budget {budget_ms} ms)"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    args = parser.parse_args()
+    ok, msg = check_import_budget(budget_ms=args.budget_ms)
+    print(msg)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,417 @@
+"""
+Checks of the unfinished processes: snapshot of their state, old workchains that can be safely deleted, paused ones to resume.
+AiiDA is imported inside the functions that query the database, the snapshot helpers work on plain data.
+"""
+import concurrent.futures
+import time
+from datetime import datetime, timedelta, timezone
+
+# Rows fetched per round trip when streaming query results
+ITERATION_BATCH_SIZE = 500
+
+QUERY_BATCH_SIZE = 1000  # maximum number of pks in a single 'in' filter
+
+# Values of aiida.common.links.LinkType
+CALL_LINK_TYPES = ['call_calc', 'call_work']
+
+def batches(items, size=QUERY_BATCH_SIZE):
+    """Splits items in lists of at most size elements."""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def resolve_root_callers(process_pks, callers=None, max_calls=5000):
+    """
+    Traces back to the first caller (root node) of many processes at once,
+    following the CALL links one level at a time with one query per level for all the processes.
+
+    :param process_pks: PKs of the processes.
+    :param callers: Optional memo dict pk -> PK of the direct caller (None for a root), filled while resolving.
+                    Passing the same dict to later calls avoids resolving shared ancestors again.
+    :param max_calls: Maximum number of levels to prevent infinite loops.
+    :return: dict pk -> PK of the first caller.
+    """
+    from aiida.orm import QueryBuilder, ProcessNode
+
+    callers = {} if callers is None else callers
+    frontier = {pk for pk in process_pks if pk not in callers}
+    num_calls = 0
+    while frontier and num_calls < max_calls:
+        for batch in batches(frontier):
+            qb = QueryBuilder()
+            qb.append(ProcessNode, filters={'id': {'in': batch}}, tag='callee', project='id')
+            qb.append(
+                ProcessNode,
+                with_outgoing='callee',
+                edge_filters={'type': {'in': CALL_LINK_TYPES}},
+                project='id'
+            )
+            found = dict(qb.all())
+            for pk in batch:
+                callers[pk] = found.get(pk)
+        frontier = {caller for caller in (callers[pk] for pk in frontier) if caller is not None and caller not in callers}
+        num_calls += 1
+
+    roots = {}
+    for pk in process_pks:
+        chain = [pk]
+        while chain[-1] not in roots and callers.get(chain[-1]) is not None and len(chain) <= max_calls:
+            chain.append(callers[chain[-1]])
+        root = roots.get(chain[-1], chain[-1])
+        for node in chain:
+            roots[node] = root
+    return {pk: roots[pk] for pk in process_pks}
+
+def first_caller(node_pk, max_calls=5000):
+    """
+    Traces back to the first caller (root node) of a given node.
+    
+    :param node_pk: The PK of the node.
+    :param max_calls: Maximum recursion depth to prevent infinite loops.
+    :return: PK of the first caller.
+    """
+    return resolve_root_callers([node_pk], max_calls=max_calls)[node_pk]
+
+# Processes that can consume a StructureData
+CONSUMER_NODE_TYPES = [
+    'process.calculation.calcjob.CalcJobNode.',
+    'process.workflow.workchain.WorkChainNode.',
+    'process.calculation.function.CalcFunctionNode.'
+]
+
+# Links followed from a workchain down to the nodes it created or returned, through the processes it called
+TRAVERSAL_LINK_TYPES = CALL_LINK_TYPES + ['create', 'return']
+
+def iter_structuredata_descendants(parent_pks, max_depth=None, batch_size=ITERATION_BATCH_SIZE):
+    """
+    Streams the StructureData nodes created or returned within the subtree of the given processes.
+    Only CALL, CREATE and RETURN links are followed, one query per level (and batch of nodes),
+    so the cost is proportional to the subtree of the processes and not to the whole provenance graph.
+
+    :param parent_pks: PKs of the parent processes (e.g., WorkChain PKs).
+    :param max_depth: Maximum number of links to follow, unbounded if None.
+    :param batch_size: Rows fetched per round trip.
+    :return: generator of (parent PK, StructureData PK), each pair yielded once.
+    """
+    from aiida.orm import QueryBuilder, Node
+
+    reached = {pk: {pk} for pk in parent_pks}  # node -> parents from which it was reached
+    frontier = dict(reached)
+    depth = 0
+    while frontier and (max_depth is None or depth < max_depth):
+        next_frontier = {}
+        for batch in batches(frontier):
+            qb = QueryBuilder()
+            qb.append(Node, filters={'id': {'in': batch}}, tag='source', project=['id'])
+            qb.append(
+                Node,
+                with_incoming='source',
+                edge_filters={'type': {'in': TRAVERSAL_LINK_TYPES}},
+                project=['id', 'node_type']
+            )
+            for source_pk, target_pk, node_type in qb.iterall(batch_size=batch_size):
+                new_parents = frontier[source_pk] - reached.get(target_pk, set())
+                if not new_parents:
+                    continue
+                reached.setdefault(target_pk, set()).update(new_parents)
+                if node_type.startswith('data.core.structure.'):
+                    for parent_pk in new_parents:
+                        yield parent_pk, target_pk
+                elif node_type.startswith('process.'):
+                    next_frontier.setdefault(target_pk, set()).update(new_parents)
+        frontier = next_frontier
+        depth += 1
+
+def get_structuredata_descendants_map(parent_pks, max_depth=None):
+    """
+    Returns the StructureData nodes created within the subtree of many processes.
+
+    :param parent_pks: PKs of the parent processes (e.g., WorkChain PKs).
+    :param max_depth: Maximum number of links to follow, unbounded if None.
+    :return: dict parent PK -> set of StructureData node PKs.
+    """
+    descendants = {}
+    for parent_pk, structure_pk in iter_structuredata_descendants(parent_pks, max_depth=max_depth):
+        descendants.setdefault(parent_pk, set()).add(structure_pk)
+    return descendants
+
+def get_structuredata_descendants(parent_pk):
+    """
+    Returns all StructureData nodes that are descendants of a given node.
+    
+    :param parent_pk: The PK of the parent node (e.g., WorkChain PK).
+    :return: A list of StructureData node PKs.
+    """
+    return list(get_structuredata_descendants_map([parent_pk]).get(parent_pk, ()))
+
+def iter_structuredata_consumers(structure_pks, batch_size=ITERATION_BATCH_SIZE):
+    """
+    Streams the CalcJob, WorkChain, and CalcFunction nodes that have 
+    one of the given StructureData nodes as an input, with one query per batch of structures.
+
+    :param structure_pks: PKs of the StructureData nodes.
+    :param batch_size: Rows fetched per round trip.
+    :return: generator of (StructureData PK, process node PK)
+    """
+    from aiida.orm import QueryBuilder, StructureData, Node
+
+    for batch in batches(structure_pks):
+        qb = QueryBuilder()
+        qb.append(StructureData, filters={'id': {'in': batch}}, tag='structure', project=['id'])
+        qb.append(
+            Node, 
+            with_incoming='structure',  # Find nodes that receive the StructureData as input
+            filters={'node_type': {'in': CONSUMER_NODE_TYPES}},
+            project=['id']  # Retrieve PKs only
+        )
+        yield from qb.iterall(batch_size=batch_size)
+
+def get_structuredata_consumers_map(structure_pks):
+    """
+    Returns the CalcJob, WorkChain, and CalcFunction nodes that have 
+    each of the given StructureData nodes as an input.
+
+    :param structure_pks: PKs of the StructureData nodes.
+    :return: dict StructureData PK -> set of process node PKs.
+    """
+    consumers = {}
+    for structure_pk, process_pk in iter_structuredata_consumers(structure_pks):
+        consumers.setdefault(structure_pk, set()).add(process_pk)
+    return consumers
+
+def get_processes_with_structuredata_input(structure_pks):
+    """
+    Returns all CalcJob, WorkChain, and CalcFunction nodes that have 
+    a given StructureData node as an input.
+    
+    :param structure_pks: List of StructureData PKs.
+    :return: A list of process node PKs.
+    """
+    return list({process_pk for _, process_pk in iter_structuredata_consumers(structure_pks)})
+
+def safe_to_delete_batch(workchain_pks, callers=None):
+    """
+    Determines which WorkChainNodes can be safely deleted, for all of them at once.
+    A workchain is safe to delete if every process consuming one of its StructureData descendants
+    has the workchain itself as root caller.
+    The descendants, consumers and root callers of all the workchains are collected in a single index
+    with a few batched queries.
+
+    :param workchain_pks: PKs of the WorkChainNodes.
+    :param callers: Optional memo of the direct callers shared between calls, see resolve_root_callers.
+    :return: dict workchain PK -> True if it can be safely removed, False otherwise.
+    """
+    descendants = get_structuredata_descendants_map(workchain_pks)
+    consumers = get_structuredata_consumers_map(set().union(*descendants.values()))
+    roots = resolve_root_callers(set().union(*consumers.values()), callers=callers)
+    return {
+        workchain_pk: all(
+            roots[process_pk] == workchain_pk
+            for structure_pk in descendants.get(workchain_pk, ())
+            for process_pk in consumers.get(structure_pk, ())
+        )
+        for workchain_pk in workchain_pks
+    }
+
+def safe_to_delete(workchain_pk):
+    """
+    Determines if a WorkChainNode can be safely deleted.
+    
+    :param workchain_pk: The PK of the WorkChainNode.
+    :return: True if it can be safely removed, False otherwise.
+    """
+    return safe_to_delete_batch([workchain_pk])[workchain_pk]
+
+PROCESS_SNAPSHOT_FIELDS = ['id', 'node_type', 'ctime', 'label', 'attributes.process_state', 'attributes.paused']
+
+def iter_process_status(batch_size=ITERATION_BATCH_SIZE):
+    """
+    Streams the state of all the unfinished WorkChainNodes and CalcJobNodes from a single query.
+
+    :return: generator of dicts with keys id, node_type, ctime, label, process_state, paused
+    """
+    from aiida import load_profile
+    from aiida.orm import QueryBuilder, WorkChainNode, CalcJobNode
+
+    if not load_profile():
+        load_profile("default")
+    qb = QueryBuilder()
+    qb.append(
+        [WorkChainNode, CalcJobNode],
+        tag='process',
+        filters={'attributes.process_state': {'!in': ['finished', 'excepted', 'killed']}},  # Not finished
+        project=PROCESS_SNAPSHOT_FIELDS
+    )
+    qb.order_by({'process': 'id'})
+    keys = ['id', 'node_type', 'ctime', 'label', 'process_state', 'paused']
+    for row in qb.iterall(batch_size=batch_size):
+        yield dict(zip(keys, row))
+
+def get_process_status_snapshot():
+    """
+    Returns the state of all the unfinished WorkChainNodes and CalcJobNodes with a single query.
+    The snapshot is classified in memory by classify_process_snapshot, for every panel of the app.
+
+    :return: list of dicts with keys id, node_type, ctime, label, process_state, paused
+    """
+    return list(iter_process_status())
+
+def classify_process_snapshot(snapshot, cutoffdays=30, reverse=False, paused=False):
+    """
+    Selects processes of a snapshot taken with get_process_status_snapshot (or streamed by iter_process_status).
+
+    :param cutoffdays: Age in days of the processes.
+    :param reverse: Select the WorkChains created less (instead of more) than cutoffdays ago.
+    :param paused: Select the paused WorkChains and CalcJobs created less than cutoffdays ago.
+    :return: list of PKs.
+    """
+    cutoff_date = datetime.now(timezone.utc) - timedelta(days=cutoffdays)  # the ctime of the nodes is timezone aware
+    if paused:
+        return [entry['id'] for entry in snapshot if entry['ctime'] > cutoff_date and entry['paused']]
+    workchains = (entry for entry in snapshot if entry['node_type'].startswith('process.workflow.workchain.'))
+    if reverse:
+        return [entry['id'] for entry in workchains if entry['ctime'] > cutoff_date]  # Created less than x days ago
+    return [entry['id'] for entry in workchains if entry['ctime'] < cutoff_date]  # Created more than x days ago
+
+def get_old_workchain_candidates(snapshot, cutoffdays=30):
+    """
+    Returns the entries of the unfinished WorkChainNodes older than cutoffdays, without checking if they can be removed.
+
+    :param snapshot: Process snapshot from get_process_status_snapshot.
+    :return: list of dicts with keys id, node_type, ctime, label, process_state, paused
+    """
+    old_pks = set(classify_process_snapshot(snapshot, cutoffdays=cutoffdays))
+    return [entry for entry in snapshot if entry['id'] in old_pks]
+
+def delete_workchains(workchain_pks, dry_run=True):
+    """
+    Deletes workchains, together with the nodes AiiDA deletes with them, in a single traversal and transaction.
+
+    :param workchain_pks: PKs of the WorkChainNodes.
+    :param dry_run: Only collect the nodes that would be deleted.
+    :return: (set of the PKs of the deleted nodes (or to be deleted), True if the nodes were deleted)
+    """
+    if not workchain_pks:
+        return set(), False
+    from aiida.tools import delete_nodes  # graph traversal tools, only needed here
+    return delete_nodes(list(workchain_pks), dry_run=dry_run)
+
+def get_unfinished_workchains(workchain_pks):
+    """
+    Returns the workchains among workchain_pks that are still unfinished, e.g. to recheck a stale selection.
+
+    :return: set of PKs.
+    """
+    from aiida.orm import QueryBuilder, WorkChainNode
+
+    unfinished = set()
+    for batch in batches(list(workchain_pks)):
+        qb = QueryBuilder()
+        qb.append(
+            WorkChainNode,
+            filters={'id': {'in': batch}, 'attributes.process_state': {'!in': ['finished', 'excepted', 'killed']}},
+            project='id'
+        )
+        unfinished.update(qb.all(flat=True))
+    return unfinished
+
+def get_old_unfinished_workchains(cutoffdays=30,reverse=False,paused=False,snapshot=None):
+    """
+    Returns a formatted message with all WorkChainNodes that are older than 30 days and unfinished.
+    
+    :param snapshot: Process snapshot from get_process_status_snapshot, streamed from the database if None.
+    :return: HTML formatted message with green (✅) and red (❌) indicators.
+    """
+    if snapshot is None:
+        snapshot = iter_process_status()
+    old_unfinished = classify_process_snapshot(snapshot, cutoffdays=cutoffdays, reverse=reverse, paused=paused)
+    if not old_unfinished:
+        return False,"<style='color: green;'>✅ No old unfinished WorkChainNodes found.<br>"
+    
+    if paused:
+        msg = ' '.join(str(num) for num in old_unfinished)
+        return True,msg
+    msg = "<style='color: darkorange;'>⚠️ Found old unfinished WorkChains<br>"
+    msg += "<p>Ask for help if you are unsure about removing them.</p><ul>"
+    
+    callers = {}
+    for batch in batches(old_unfinished):
+        deletable = safe_to_delete_batch(batch, callers=callers)
+        for pk in batch:
+            if deletable[pk]:
+                msg += f"<li style='color: green;'>✅ WorkChain <strong>PK {pk}</strong> can be safely removed.</li>"
+            else:
+                msg += f"<li style='color: red;'>❌ WorkChain <strong>PK {pk}</strong> cannot be safely removed.</li>"
+    
+    msg += "</ul>"
+    return True,msg
+
+RESUME_CHUNK_SIZE = 50  # processes resumed per chunk
+RESUME_RATE = 20  # maximum number of processes resumed per second
+RESUME_TIMEOUT = 5.0  # seconds to wait for the answer of the daemon
+
+def resume_processes(process_pks, chunk_size=RESUME_CHUNK_SIZE, rate=RESUME_RATE, timeout=RESUME_TIMEOUT, progress=None):
+    """
+    Resumes paused processes through the process controller of the loaded profile,
+    in chunks and with a rate limit so that RabbitMQ and the daemon workers are not flooded.
+
+    :param process_pks: PKs of the paused processes.
+    :param chunk_size: Number of play requests sent before waiting for their answers.
+    :param rate: Maximum number of processes resumed per second.
+    :param timeout: Seconds to wait for the answer to each request.
+    :param progress: Optional callable(done, total, results) called after each chunk.
+    :return: dict pk -> (success, message), every process fails with the error if the broker cannot be reached.
+    """
+    # process control stack (kiwipy/plumpy), only needed here
+    from aiida.manage import get_manager
+    from kiwipy import communications
+    from plumpy.futures import unwrap_kiwi_future
+
+    process_pks = list(process_pks)
+    try:
+        controller = get_manager().get_process_controller()
+    except Exception as e:  # broker down or misconfigured, the errors depend on the AMQP client
+        return {pk: (False, f"process controller not available: {e}") for pk in process_pks}
+    results = {}
+    chunks = list(batches(process_pks, chunk_size))
+    for index, chunk in enumerate(chunks):
+        start = time.monotonic()
+        futures = {}
+        for pk in chunk:
+            try:
+                futures[pk] = controller.play_process(pk)
+            except communications.UnroutableError:
+                results[pk] = False, "unreachable"
+            except Exception as e:  # connection lost while sending
+                results[pk] = False, str(e)
+        for pk, future in futures.items():
+            try:
+                played = unwrap_kiwi_future(future).result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                results[pk] = False, "no answer from the daemon"
+            except (communications.RemoteException, communications.DeliveryFailed) as e:
+                results[pk] = False, str(e)
+            else:
+                results[pk] = (True, "resumed") if played else (False, "could not be resumed")
+        if progress is not None:
+            progress(len(results), len(process_pks), results)
+        # rate limit, not needed after the last chunk
+        if index < len(chunks) - 1:
+            time.sleep(max(0.0, len(chunk) / rate - (time.monotonic() - start)))
+    return results
+
+def play_paused_workchains(paused_workchains, progress=None):
+    """
+    Replays paused workchains.
+    
+    :param paused_workchains: string of paused workchain PKs.
+    :param progress: Optional callable(done, total, results), see resume_processes.
+    :return: (message, True if all the workchains were resumed)
+    """
+    if not paused_workchains:
+        return "No paused workchains to play.",True
+    results = resume_processes([int(pk) for pk in paused_workchains.split()], progress=progress)
+    failed = {pk: msg for pk, (success, msg) in results.items() if not success}
+    if failed:
+        return f"{len(results) - len(failed)}/{len(results)} resumed, failed: " + ", ".join(f"{pk} ({msg})" for pk, msg in failed.items()),False
+    return f"{len(results)} resumed",True
@@ -1,4 +1,7 @@
+import os
 import subprocess
+import threading
+import time
 from pathlib import Path
 # labels for paths
 repo_name = "aiidalab-alps-files"
@@ -7,35 +10,81 @@ target_dir = home_dir / "opt"
 config_files = target_dir / repo_name  # Ensure `repo_name` is defined
 config_path = home_dir / ".ssh" 
 configuration_file = config_files / "config.yml"
+CACHE_DIR = home_dir / ".cache" / "aiidalab-empa-setup"  # on-disk caches of the app
 GIT_REPO_PATH = config_files
 GIT_URL = "https://github.com/nanotech-empa/aiidalab-alps-files.git"  # files needed on daint
 GIT_REMOTE = "origin"
 BRANCH = "main"
-def clone_repository():
-    """Clone the repository if it does not exist."""
+# Freshness of the clone: at most one fetch per interval, each network call with a hard timeout
+REPO_FETCH_INTERVAL = 600  # seconds
+GIT_NETWORK_TIMEOUT = 10  # seconds
+
+_fetch_lock = threading.Lock()
+_last_fetch_attempt = 0.0
+
+def clone_repository(timeout=120):
+    """Clone the repository if it does not exist (shallow, single branch)."""
     try:
         #print("🔄 Cloning repository...")
         result = subprocess.run(
-            ["git", "clone", "-b", BRANCH, GIT_URL, GIT_REPO_PATH],
+            ["git", "clone", "--depth", "1", "--single-branch", "-b", BRANCH, GIT_URL, GIT_REPO_PATH],
             capture_output=True,
             text=True,
-            check=True
+            check=True,
+            timeout=timeout
         )
         return True  # Repo was successfully cloned
-    except subprocess.CalledProcessError:
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
         return False  # Failed to clone
 
+def last_fetch_time():
+    """Time of the last successful fetch (mtime of FETCH_HEAD), None if the repository was never fetched."""
+    try:
+        return os.path.getmtime(GIT_REPO_PATH / ".git" / "FETCH_HEAD")
+    except OSError:
+        return None
+
+def fetch_remote(interval=REPO_FETCH_INTERVAL, timeout=GIT_NETWORK_TIMEOUT, force=False):
+    """
+    Updates the remote-tracking branch, at most once per interval.
+    Failed attempts are rate-limited as well, so that an unreachable remote does not cost a timeout at every check.
+
+    :param interval: minimal number of seconds between two fetches.
+    :param timeout: hard timeout of the fetch in seconds.
+    :param force: fetch regardless of the interval.
+    :return: True if fetched, False if the fetch failed or timed out, None if skipped because recent enough.
+    """
+    global _last_fetch_attempt
+    with _fetch_lock:
+        now = time.time()
+        last = max(last_fetch_time() or 0.0, _last_fetch_attempt)
+        if not force and now - last < interval:
+            return None
+        _last_fetch_attempt = now
+        try:
+            subprocess.run(
+                ["git", "fetch", "--depth", "1", GIT_REMOTE, BRANCH],
+                cwd=GIT_REPO_PATH,
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=timeout
+            )
+            return True
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError):
+            return False
+
 def get_latest_remote_commit():
-    """Fetch the latest commit hash from the remote repository."""
+    """Get the commit of the remote branch as of the last fetch (no network access)."""
     try:
         result = subprocess.run(
-            ["git", "ls-remote", GIT_REMOTE, BRANCH],
+            ["git", "rev-parse", "--verify", "--quiet", f"refs/remotes/{GIT_REMOTE}/{BRANCH}"],
             cwd=GIT_REPO_PATH,
             capture_output=True,
             text=True,
             check=True
         )
-        return result.stdout.split()[0] if result.stdout else None
+        return result.stdout.strip() or None
     except (subprocess.CalledProcessError, FileNotFoundError):
         return None
 
@@ -54,15 +103,18 @@ def get_local_commit():
         return None
 
 def pull_latest_changes():
-    """Pull the latest changes from the remote repository."""
+    """
+    Move the local branch to the fetched remote commit (no network access).
+    Works on shallow clones, local modifications are kept unless they conflict with the update.
+    """
     try:
-        result = subprocess.run(
-            ["git", "pull", GIT_REMOTE, BRANCH],
+        subprocess.run(
+            ["git", "reset", "--keep", f"{GIT_REMOTE}/{BRANCH}"],
             cwd=GIT_REPO_PATH,
             capture_output=True,
             text=True,
             check=True
         )
-        return "Already up to date" not in result.stdout
-    except subprocess.CalledProcessError:
-        return False
\ No newline at end of file
+        return True
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
@@ -0,0 +1,282 @@
+from .string_utils import relabel, to_camel_case
+from datetime import datetime
+from pathlib import Path
+import subprocess
+import shutil
+import stat
+import threading
+import time
+import os
+import re
+
+# SSH connection multiplexing: one ControlMaster per remote host, reused by every later ssh call.
+# The control sockets give access to the open connections, so they live in a private directory of the user.
+SSH_CONTROL_DIR = Path.home() / ".ssh" / "aiidalab-control"
+SSH_CONTROL_PERSIST = "10m"
+_ssh_sessions = {}  # host -> {'commands': ssh commands sent, 'reused': commands that found the master already open}
+_ssh_sessions_lock = threading.Lock()
+
+def _ssh_control_dir_is_private():
+    """Creates SSH_CONTROL_DIR if needed, True if it is a directory owned by the user and accessible only to them."""
+    try:
+        SSH_CONTROL_DIR.parent.mkdir(mode=0o700, exist_ok=True)
+        SSH_CONTROL_DIR.mkdir(mode=0o700, exist_ok=True)
+        info = SSH_CONTROL_DIR.lstat()
+    except OSError:
+        return False
+    return stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid() and not info.st_mode & 0o077
+
+def _ssh_control_options():
+    """Options making ssh open (or reuse) a shared master connection per host."""
+    return [
+        "-o", "ControlMaster=auto",
+        "-o", f"ControlPath={SSH_CONTROL_DIR}/%C",
+        "-o", f"ControlPersist={SSH_CONTROL_PERSIST}",
+    ]
+
+def multiplexed_ssh_command(command):
+    """
+    Rewrites an ``["ssh", host, ...]`` command so that it goes through the shared master of ``host``.
+    Any other command is returned unchanged, as are all the commands if SSH_CONTROL_DIR is not private.
+    Asks the master with ``ssh -O check`` (a local request, no network) whether the command will reuse it.
+    """
+    if not isinstance(command, list) or len(command) < 2 or command[0] != "ssh":
+        return command
+    if not _ssh_control_dir_is_private():
+        return command
+    host = command[1]
+    check = subprocess.run(["ssh"] + _ssh_control_options() + ["-O", "check", host], capture_output=True, text=True)
+    with _ssh_sessions_lock:
+        entry = _ssh_sessions.setdefault(host, {'commands': 0, 'reused': 0})
+        entry['commands'] += 1
+        entry['reused'] += check.returncode == 0
+    return ["ssh"] + _ssh_control_options() + command[1:]
+
+def ssh_session_stats():
+    """
+    Returns per-host statistics of the multiplexed SSH sessions.
+
+    :return: dict host -> {'commands': n, 'handshakes_saved': number of commands that reused an open master}
+    """
+    with _ssh_sessions_lock:
+        return {host: {'commands': entry['commands'], 'handshakes_saved': entry['reused']} for host, entry in _ssh_sessions.items()}
+
+def close_ssh_sessions(verbose=False):
+    """
+    Tears down the master connections opened in this session.
+
+    :return: Total number of SSH handshakes saved by reusing the masters.
+    """
+    stats = ssh_session_stats()
+    for host in stats:
+        subprocess.run(["ssh"] + _ssh_control_options() + ["-O", "exit", host], capture_output=True, text=True)
+    with _ssh_sessions_lock:
+        _ssh_sessions.clear()
+    saved = sum(entry['handshakes_saved'] for entry in stats.values())
+    if verbose:
+        print(f"✅ Closed {len(stats)} SSH master connection(s), {saved} handshake(s) saved.")
+    return saved
+
+def run_command(command, max_retries=5,verbose=False):
+    """
+    Run a shell command locally or over SSH, capturing output and handling errors.
+    SSH commands are multiplexed over one master connection per host.
+    Retries on 'Connection closed by remote host' errors.
+    """
+    command = multiplexed_ssh_command(command)
+    retries = max_retries if any(cmd in command for cmd in ["ssh", "scp", "ssh-keyscan"]) else 1
+    attempts = 0
+
+    while attempts < retries:
+        output, success = "", False
+        try:
+            result = subprocess.run(command, check=True, capture_output=True, text=True)
+            output, success = result.stdout.strip(), True
+            if verbose:
+                print(f"✅ Command executed successfully: {command}")
+            return output, success
+        except subprocess.CalledProcessError as e:
+            error_msg = e.stderr.strip()
+            if verbose:
+                print(f"❌ Error executing command: {error_msg}")
+            
+            if "Connection closed by remote host" in error_msg and attempts < retries - 1:
+                attempts += 1
+                if(verbose):
+                    print(f"🔄 Retrying in 5 seconds... (Attempt {attempts}/{retries})")
+                time.sleep(5)
+            else:
+                return error_msg, False  # Return error message and success=False
+
+    return "", False  # Should never reach this
+
+def check_ssh_config(config_path, config_from_yaml):
+    config_file = config_path / "config"
+    msg=""
+    reconfigure=[]
+    all_up_to_date = True
+    # Read the content of the config file
+    try:
+        with open(config_file, "r") as f:
+            config_content = f.read()
+            config_exist=True
+    except FileNotFoundError:
+        config_exist=False
+        msg += f"Config file {config_file} not found. I will create it.<br>"
+    
+    for computer, details in config_from_yaml.items():
+        setup = details.get("setup", {})
+        config = details.get("config", {})
+
+        hostname = setup.get("hostname")
+        proxy_jump = config.get("proxy_jump", "")
+        proxy_string = "Host " + proxy_jump if proxy_jump else ""
+
+        # Check if hostname is in the config file
+        need_to_update = True
+        if config_exist:
+            hostname_check = hostname in config_content if hostname else False
+            proxy_check = proxy_string in config_content if proxy_jump else True  # Skip if empty
+            need_to_update = not (hostname_check and proxy_check)
+
+        if need_to_update:
+            all_up_to_date = False
+            if config_exist:
+                msg+=f"⚠️{hostname} not properly configured in .ssh/config.<br>"
+            reconfigure.append(computer)
+    if msg == "":
+        msg = "✅ The .ssh/config seems to be OK.<br>"
+    
+    return all_up_to_date, msg, reconfigure
+
+def update_ssh_config(config_path,ssh_config_data,rename=True):
+    
+    # Ensure config_path exists
+    config_path.mkdir(parents=True, exist_ok=True)
+
+    # Define file paths
+    config_file = config_path / "config"
+    old_config_file = config_path / relabel("config") 
+          
+    if rename:
+        shutil.move(config_file, old_config_file)
+        print(f"✅ Renamed {config_file} → {old_config_file}")
+        
+    file_content = ""
+    for host in ssh_config_data:
+        #ssh_config_data[host]['user'] = username
+        file_content += f"Host {host}\n"
+        for key, value in ssh_config_data[host].items():
+            file_content += f"  {to_camel_case(key)} {value}\n"  # Capitalize the first letter of key
+        file_content += "\n"
+
+
+    with open(config_file, "w") as file:
+        file.write(file_content + "\n")  # Ensure a newline at the end
+
+    print(f"✅ Created new SSH config at {config_file}")
+    return
+
+def set_ssh(config, hosts):
+    """
+    Adds SSH host keys to known_hosts for the specified hosts.
+
+    Args:
+        config (dict): SSH configuration details from YAML.
+        hosts (list): List of hosts to update in known_hosts.
+
+    Returns:
+        bool: True if SSH check succeeds, False otherwise.
+    """
+    
+    for computer in hosts:
+        proxy = config[computer]["config"].get("proxy_jump", "")
+        remotehost = config[computer]["setup"]["hostname"]
+
+        if proxy:
+            print(f"🔄 Adding {proxy} to known_hosts...")
+            ssh_keyscan_command = ["ssh-keyscan", "-H", proxy]
+            add_to_known_hosts(ssh_keyscan_command)
+
+            print(f"🔄 Adding {remotehost} via {proxy} to known_hosts...")
+            ssh_keyscan_command = ["ssh", proxy, "ssh-keyscan", "-H", remotehost]
+            add_to_known_hosts(ssh_keyscan_command)
+        else:
+            print(f"🔄 Adding {remotehost} to known_hosts...")
+            ssh_keyscan_command = ["ssh-keyscan", "-H", remotehost]
+            add_to_known_hosts(ssh_keyscan_command)
+
+    # Check if SSH works by listing the remote directory
+    ssh_check_command = ["ssh", remotehost, "ls"]
+    command_out, command_ok = run_command(ssh_check_command)
+
+    return command_ok
+
+
+def add_to_known_hosts(ssh_keyscan_command):
+    """
+    Runs ssh-keyscan and appends the output to ~/.ssh/known_hosts.
+
+    Args:
+        ssh_keyscan_command (list): The command to run (split properly).
+
+    Returns:
+        bool: True if the command succeeds, False otherwise.
+    """
+    try:
+        with open(os.path.expanduser("~/.ssh/known_hosts"), "a") as f:
+            known_host, success = run_command(ssh_keyscan_command)
+            if success:
+                f.write(known_host + "\n")
+        return True  # Success
+
+    except subprocess.CalledProcessError as e:
+        error_msg = e.stderr.strip() if e.stderr else "Unknown error (no stderr output)"
+        print(f"❌ Error adding to known_hosts: {error_msg}")
+    
+    return False  # Failure
+
+def execute_custom_commands(yaml_commands):
+    """Execute all commands from custom_commands in the YAML file."""    
+    if "custom_commands" not in yaml_commands:
+        print("❌ No custom commands found in YAML file. Exiting.")
+        return False
+    
+    # Execute remote computer commands
+    remote_commands = yaml_commands["custom_commands"].get("remote_commands", {})
+    remotehost = remote_commands.pop('remotehost') # remove the remotehost from the dictionary after assigning it
+    for setup_name, commands in remote_commands.items():
+        print(f"🔄 Executing remote commands for {setup_name} on {remotehost}...")
+        for entry in commands:
+            formatted_command = entry["command"]
+            remote_command = ["ssh", remotehost, formatted_command] if entry["type"] == "ssh" else formatted_command.split()
+            output, success = run_command(remote_command)
+            if not success:
+                print(f"❌ Failed to execute: {entry['type']} {formatted_command}. Exiting, ask for help.")
+                return False
+    return True
+    
+def parse_validity_time(public_key_file):
+    """Parse the validity time from the output."""
+    output = subprocess.run(
+        ["ssh-keygen", "-L", "-f", public_key_file],
+        encoding="utf-8",
+        capture_output=True,
+    ).stdout
+
+    matched_line = (
+        re.search(r"^.*{}.*$".format("Valid:"), output, flags=re.MULTILINE)
+        .group(0)
+        .split()
+    )
+    start = datetime.fromisoformat(matched_line[2])
+    end = datetime.fromisoformat(matched_line[4])
+    return start, end
+
+def key_is_valid(public_key_file = ''):
+    """Check if the key is valid."""
+    start, end = parse_validity_time(public_key_file)
+    if start < datetime.now() < end:
+        return True
+    else:
+        return False
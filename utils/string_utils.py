@@ -1,5 +1,8 @@
 from datetime import datetime
+import hashlib
+import json
 import re
+from collections import namedtuple
 # labels to rename old host and codes
 def extract_first_column(command_output):
     """Extracts only the first column (UENV image names) from multi-column output."""
@@ -50,4 +53,112 @@ def normalize_text(text):
     lines = [re.sub(r"\s+", " ", line.strip()) for line in text.splitlines() if line.strip()]
 
     # Join lines back together while preserving newlines
-    return "\n".join(lines)
\ No newline at end of file
+    return "\n".join(lines)
+
+def _normalize_data(data):
+    """Recursively applies normalize_text to the strings of a dict/list structure."""
+    if isinstance(data, dict):
+        return {str(key): _normalize_data(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_normalize_data(value) for value in data]
+    if isinstance(data, str):
+        return normalize_text(data)
+    return data
+
+def fingerprint(data):
+    """
+    Canonical hash of a (nested) configuration entry.
+    Strings are normalized with normalize_text, so entries that compare equal field by field have the same fingerprint.
+    """
+    canonical = json.dumps(_normalize_data(data), sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+# {placeholder} in the strings of config.yml, names can contain '-' and '.' (e.g. {cscs-username}, {daint.grant})
+# but not start with them, so shell brace expansions like {1..10} or {a,b} stay literal text
+PLACEHOLDER_PATTERN = re.compile(r"\{([A-Za-z_][\w.-]*)\}")
+# Placeholders filled by AiiDA itself at runtime, e.g. {tot_num_mpiprocs} in mpirun_command and {username} in work_dir
+AIIDA_TEMPLATE_FIELDS = frozenset({
+    "username",
+    "tot_num_mpiprocs", "num_machines", "num_mpiprocs_per_machine", "num_cores_per_machine",
+    "num_cores_per_mpiproc", "parallel_env",
+})
+# A string compiled once: parts alternates literal text and placeholder names (literal, name, literal, ..., literal)
+Template = namedtuple("Template", ["parts"])
+
+def compile_template(text):
+    """Splits a string once into literal text and {placeholder} names."""
+    return Template(tuple(PLACEHOLDER_PATTERN.split(text)))
+
+def compile_tree(obj):
+    """Recursively compiles all the strings of dictionaries and lists into Templates."""
+    if isinstance(obj, dict):
+        return {k: compile_tree(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [compile_tree(item) for item in obj]
+    elif isinstance(obj, str):
+        return compile_template(obj)
+    return obj
+
+def render_template(template, values, unresolved):
+    """
+    Renders a Template in a single pass.
+    Placeholders without a value are left as they are and added to unresolved,
+    except shell variables like ${NAME} and the AIIDA_TEMPLATE_FIELDS.
+    """
+    rendered = []
+    for index, part in enumerate(template.parts):
+        if index % 2 == 0:
+            rendered.append(part)
+        elif part in values:
+            rendered.append(values[part])
+        else:
+            rendered.append(f"{{{part}}}")
+            if not template.parts[index - 1].endswith("$") and part not in AIIDA_TEMPLATE_FIELDS:
+                unresolved.add(part)
+    return "".join(rendered)
+
+def render_tree(compiled, values, unresolved):
+    """Renders a tree compiled by compile_tree, collecting the unresolved placeholders."""
+    if isinstance(compiled, dict):
+        return {k: render_tree(v, values, unresolved) for k, v in compiled.items()}
+    elif isinstance(compiled, list):
+        return [render_tree(item, values, unresolved) for item in compiled]
+    elif isinstance(compiled, Template):
+        return render_template(compiled, values, unresolved)
+    return compiled
+
+def resolve_variables(templates, values, unresolved):
+    """
+    Resolves variables that can refer to each other and to known values, in dependency order.
+    A variable referring to its own name takes the known value (e.g. the widget with the same name),
+    every variable of a dependency cycle is left unresolved.
+
+    :param templates: dict variable name -> Template
+    :param values: dict name -> value of the already known placeholders (e.g. widgets)
+    :param unresolved: set collecting the unresolved placeholders
+    :return: dict variable name -> resolved string
+    """
+    resolved = {}
+    visiting = []  # variables being resolved, in dependency order
+
+    def resolve(name):
+        if name in resolved:
+            return resolved[name]
+        visiting.append(name)
+        template = templates[name]
+        dependencies = {}
+        for dependency in template.parts[1::2]:
+            if dependency in templates and dependency != name:
+                if dependency in visiting:
+                    unresolved.update(visiting[visiting.index(dependency):])  # the whole cycle
+                else:
+                    dependencies[dependency] = resolve(dependency)
+            elif dependency in values:
+                dependencies[dependency] = values[dependency]
+        visiting.pop()
+        resolved[name] = render_template(template, dependencies, unresolved)
+        return resolved[name]
+
+    for name in templates:
+        resolve(name)
+    return resolved
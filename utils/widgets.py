@@ -0,0 +1,172 @@
+import ipywidgets as ipw
+from .process_utils import safe_to_delete_batch, delete_workchains, get_unfinished_workchains, batches
+
+class OldWorkchainsReport(ipw.VBox):
+    """
+    Paginated report of the old unfinished workchains.
+    The candidates are listed right away, the safe-to-delete verdicts are computed only for the visible page
+    and kept for the next renderings.
+    """
+    def __init__(self, page_size=20):
+        self.page_size = page_size
+        self.entries = []
+        self.page = 0
+        self.verdicts = {}  # pk -> safe to delete
+        self.callers = {}  # memo of the direct callers shared by all the pages
+
+        self.header = ipw.HTML("")
+        self.table = ipw.HTML("")
+        self.page_label = ipw.HTML("")
+        self.prev_button = ipw.Button(description="◀ Previous", disabled=True)
+        self.prev_button.on_click(lambda _: self.show_page(self.page - 1))
+        self.next_button = ipw.Button(description="Next ▶", disabled=True)
+        self.next_button.on_click(lambda _: self.show_page(self.page + 1))
+        self.navigation = ipw.HBox([self.prev_button, self.page_label, self.next_button])
+        self.navigation.layout.display = 'none'
+
+        # Bulk deletion of all the workchains that can be safely removed
+        self.to_delete = []
+        self.delete_button = ipw.Button(description="Delete safe workchains", button_style="danger", disabled=True)
+        self.delete_button.on_click(self.prepare_deletion)
+        self.confirm_button = ipw.Button(description="Confirm deletion", button_style="danger")
+        self.confirm_button.on_click(self.delete_safe_workchains)
+        self.cancel_button = ipw.Button(description="Cancel")
+        self.cancel_button.on_click(self.cancel_deletion)
+        self.confirmation = ipw.HBox([self.confirm_button, self.cancel_button])
+        self.confirmation.layout.display = 'none'
+        self.progress = ipw.IntProgress(value=0, min=0, max=1, description="Deleting")
+        self.progress.layout.display = 'none'
+        self.deletion_message = ipw.HTML("")
+
+        super().__init__([
+            self.header, self.table, self.navigation,
+            self.delete_button, self.progress, self.deletion_message, self.confirmation,
+        ])
+
+    @property
+    def num_pages(self):
+        return max(1, -(-len(self.entries) // self.page_size))
+
+    def set_entries(self, entries):
+        """Shows a new list of candidates (see get_old_workchain_candidates), starting from the first page."""
+        self.entries = list(entries)
+        # the verdicts change as soon as other workflows consume the structures; the callers (CALL links) do not
+        self.verdicts = {}
+        self.delete_button.disabled = not self.entries
+        self.cancel_deletion(None)
+        if not self.entries:
+            self.header.value = "<b>Old WorkChains Check:</b> <style='color: green;'>✅ No old unfinished WorkChainNodes found.<br>"
+            self.table.value = ""
+            self.navigation.layout.display = 'none'
+            return
+        self.header.value = (
+            f"<b>Old WorkChains Check:</b> <style='color: darkorange;'>⚠️ Found {len(self.entries)} old unfinished WorkChains<br>"
+            "<p>Ask for help if you are unsure about removing them.</p>"
+        )
+        self.navigation.layout.display = 'flex' if self.num_pages > 1 else 'none'
+        self.show_page(0)
+
+    def page_entries(self):
+        start = self.page * self.page_size
+        return self.entries[start:start + self.page_size]
+
+    def show_page(self, page):
+        self.page = min(max(page, 0), self.num_pages - 1)
+        self.prev_button.disabled = self.page == 0
+        self.next_button.disabled = self.page == self.num_pages - 1
+        self.page_label.value = f"&nbsp;Page {self.page + 1}/{self.num_pages}&nbsp;"
+        # list the candidates first, then compute the missing verdicts of the page
+        self.render()
+        missing = [entry['id'] for entry in self.page_entries() if entry['id'] not in self.verdicts]
+        if missing:
+            self.verdicts.update(safe_to_delete_batch(missing, callers=self.callers))
+            self.render()
+
+    def render(self):
+        rows = ""
+        for entry in self.page_entries():
+            description = f"WorkChain <strong>PK {entry['id']}</strong> {entry['label']} ({entry['process_state']}, created {entry['ctime']:%Y-%m-%d %H:%M})"
+            verdict = self.verdicts.get(entry['id'])
+            if verdict is None:
+                rows += f"<li>🔄 {description} checking...</li>"
+            elif verdict:
+                rows += f"<li style='color: green;'>✅ {description} can be safely removed.</li>"
+            else:
+                rows += f"<li style='color: red;'>❌ {description} cannot be safely removed.</li>"
+        self.table.value = f"<ul>{rows}</ul>"
+
+    def prepare_deletion(self, _):
+        """Recomputes the verdicts of all the pages and shows how many nodes a deletion would remove."""
+        self.delete_button.disabled = True
+        self.deletion_message.value = ""
+        # fresh verdicts: the ones shown may be stale
+        pages = list(batches([entry['id'] for entry in self.entries], self.page_size))
+        self.progress.description = "Checking"
+        self.progress.max, self.progress.value = max(1, len(pages)), 0
+        self.progress.layout.display = 'flex'
+        for batch in pages:
+            self.verdicts.update(safe_to_delete_batch(batch, callers=self.callers))
+            self.progress.value += 1
+        self.progress.layout.display = 'none'
+        self.render()
+
+        self.to_delete = [entry['id'] for entry in self.entries if self.verdicts[entry['id']]]
+        if not self.to_delete:
+            self.deletion_message.value = "✅ No workchain can be safely removed."
+            self.delete_button.disabled = False
+            return
+        node_pks, _ = delete_workchains(self.to_delete, dry_run=True)
+        self.deletion_message.value = (
+            f"⚠️ Deleting {len(self.to_delete)} workchains will remove {len(node_pks)} nodes in total. "
+            "This cannot be undone."
+        )
+        self.confirmation.layout.display = 'flex'
+
+    def delete_safe_workchains(self, _):
+        """
+        Deletes the confirmed workchains that are still unfinished and still safe to delete,
+        in a single traversal and transaction. The progress is reported per phase.
+        """
+        self.confirmation.layout.display = 'none'
+        self.progress.description = "Deleting"
+        self.progress.max, self.progress.value = 3, 0
+        self.progress.layout.display = 'flex'
+        try:
+            # the dry run may be stale by now: recheck the confirmed workchains right before deleting
+            self.deletion_message.value = "🔄 Checking that the workchains are still unfinished..."
+            unfinished = get_unfinished_workchains(self.to_delete)
+            finished = set(self.to_delete) - unfinished
+            self.progress.value += 1
+
+            self.deletion_message.value = "🔄 Checking that the workchains are still safe to delete..."
+            verdicts = safe_to_delete_batch(sorted(unfinished), callers=self.callers)
+            self.verdicts.update(verdicts)
+            to_delete = [pk for pk in self.to_delete if verdicts.get(pk)]
+            self.progress.value += 1
+
+            self.deletion_message.value = f"🔄 Deleting {len(to_delete)} workchains..."
+            node_pks, deleted = delete_workchains(to_delete, dry_run=False)
+            self.progress.value += 1
+        finally:
+            self.progress.layout.display = 'none'
+        not_safe = len(unfinished) - len(to_delete)
+        self.to_delete = []
+        if to_delete and not deleted:
+            self.deletion_message.value = "❌ Workchains were not deleted, please check."
+            self.delete_button.disabled = False
+            self.render()
+            return
+        message = f"✅ Deleted {len(to_delete)} workchains ({len(node_pks)} nodes)."
+        if finished:
+            message += f" {len(finished)} finished in the meantime and were kept."
+        if not_safe:
+            message += f" {not_safe} are not safe to delete any more and were kept."
+        # the finished ones are not old unfinished workchains any more
+        self.set_entries([entry for entry in self.entries if entry['id'] not in node_pks and entry['id'] not in finished])
+        self.deletion_message.value = message
+
+    def cancel_deletion(self, _):
+        self.to_delete = []
+        self.confirmation.layout.display = 'none'
+        self.deletion_message.value = ""
+        self.delete_button.disabled = not self.entries